@@ -0,0 +1,141 @@
+import asyncio
+import math
+import time
+from collections import defaultdict
+
+BASELINE_WINDOW = 10.0
+
+
+# minimum latency over the current and previous window, so the baseline
+# follows a host that gets slower instead of keeping its best ever sample
+class LatencyBaseline:
+    def __init__(self, window: float = BASELINE_WINDOW) -> None:
+        self.window = window
+        self.window_start = time.monotonic()
+        self.current = math.inf
+        self.previous = math.inf
+
+    def update(self, latency: float, now: float) -> None:
+        elapsed = now - self.window_start
+        if elapsed >= self.window:
+            self.previous = self.current if elapsed < 2 * self.window else math.inf
+            self.current = math.inf
+            self.window_start = now
+
+        self.current = min(self.current, latency)
+
+    @property
+    def value(self) -> float:
+        return min(self.current, self.previous)
+
+
+# AIMD limit state, global or for a single host
+class AIMDLimit:
+    def __init__(self, initial: float, minimum: int, maximum: int, backoff: float) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.in_flight = 0
+        self.last_decrease = 0.0
+
+    def update(self, congested: bool, start: float, now: float) -> None:
+        if not congested:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif start >= self.last_decrease:
+            # one decrease per congestion event, not one per in-flight request
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self.last_decrease = now
+
+    def available(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+
+# AIMD concurrency limit driven by request latency and timeouts
+class AdaptiveLimiter:
+    def __init__(
+            self, initial_limit: int = 2, min_limit: int = 1, max_limit: int = 64,
+            backoff: float = 0.5, latency_tolerance: float = 2.0,
+            per_host_limit: int | None = None
+        ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+
+        self.total = AIMDLimit(initial_limit, min_limit, max_limit, backoff)
+        self.condition = asyncio.Condition()
+        # with per_host_limit, latency congestion only shrinks that host's own limit
+        self.hosts: defaultdict[str | None, AIMDLimit] | None = None
+        if per_host_limit is not None:
+            self.hosts = defaultdict(lambda: AIMDLimit(
+                min(initial_limit, per_host_limit), min_limit, per_host_limit, backoff
+            ))
+        self.baselines: defaultdict[str | None, LatencyBaseline] = defaultdict(LatencyBaseline)
+
+        self.started_at = time.monotonic()
+        self.completed = 0
+        self.timeouts = 0
+
+    @property
+    def limit(self) -> float:
+        return self.total.limit
+
+    @property
+    def in_flight(self) -> int:
+        return self.total.in_flight
+
+    async def acquire(self, host: str | None = None) -> float:
+        host_limit = self.hosts[host] if self.hosts is not None else None
+
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.total.available()
+                and (host_limit is None or host_limit.available())
+            )
+            self.total.in_flight += 1
+            if host_limit is not None:
+                host_limit.in_flight += 1
+
+        return time.monotonic()
+
+    async def release(self, start: float, timed_out: bool, host: str | None = None) -> None:
+        now = time.monotonic()
+        latency = now - start
+        self.completed += 1
+
+        baseline = self.baselines[host]
+        if timed_out:
+            self.timeouts += 1
+        else:
+            baseline.update(latency, now)
+
+        slow = latency > baseline.value * self.latency_tolerance
+        if self.hosts is not None:
+            # timeouts still count against the global limit, slowness only per host
+            self.hosts[host].update(timed_out or slow, start, now)
+            self.total.update(timed_out, start, now)
+        else:
+            self.total.update(timed_out or slow, start, now)
+
+        async with self.condition:
+            self.total.in_flight -= 1
+            if self.hosts is not None:
+                self.hosts[host].in_flight -= 1
+            self.condition.notify_all()
+
+    def metrics(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        metrics = {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "throughput": round(self.completed / elapsed, 2) if elapsed else 0.0,
+        }
+        if self.hosts is not None:
+            metrics["host_limits"] = {
+                str(host): int(host_limit.limit) for host, host_limit in self.hosts.items()
+            }
+
+        return metrics
@@ -0,0 +1,78 @@
+import aiohttp
+import uvicorn
+
+from web_application import HTTP_STATUS_LINES, UPSTREAM_URL
+
+DEFAULT_HEADERS = [(b"content-type", b"text/plain")]
+
+session: aiohttp.ClientSession | None = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    global session
+
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=1000, limit_per_host=0, ttl_dns_cache=300)
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=13, sock_connect=3.05),
+        )
+
+    return session
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    if scope["method"] != "GET":
+        await respond(send, 405, b"GET requests only.")
+        return
+
+    path: str = scope["path"]
+    currency: str = path.split("/")[1]
+
+    if not currency:
+        await respond(send, 404, b"Currency required.")
+        return
+
+    status_code, r_text = await fetch_exchange_rate(currency)
+    if status_code not in HTTP_STATUS_LINES:
+        status_code = 502
+
+    await respond(send, status_code, r_text)
+
+
+async def respond(send, status_code: int, body: bytes) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": DEFAULT_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+
+        if message["type"] == "lifespan.startup":
+            get_session()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if session is not None:
+                await session.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def fetch_exchange_rate(currency: str) -> tuple[int, bytes]:
+    url = f"{UPSTREAM_URL}/{currency}"
+
+    async with get_session().get(url) as r:
+        return r.status, await r.read()
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8000)
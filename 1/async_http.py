@@ -1,14 +1,22 @@
 import asyncio
 import json
+from functools import partial
+from urllib.parse import urlsplit
 
-import aiofiles
 import aiohttp
 from aiohttp.client_exceptions import (
     ClientConnectionError,
     ClientConnectorDNSError,
-    ConnectionTimeoutError,
+    ServerTimeoutError,
 )
 
+from instrumentation import metrics
+from resilience import CircuitOpenError, Resilience
+from result_writer import ResultWriter
+
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 10
+
 urls = [
     "https://nonexistent.url",
     "https://example.com",
@@ -16,37 +24,79 @@ urls = [
 ]
 
 
-async def fetch_urls(urls: list[str], file_path: str) -> None:
-    sem = asyncio.Semaphore(5)
-    fetch_tasks = [fetch_url(url, sem) for url in urls]
+def make_session(limit: int, limit_per_host: int) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=limit, limit_per_host=limit_per_host, ttl_dns_cache=300
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
 
-    for earliest_fetch in asyncio.as_completed(fetch_tasks):
-        url, status_code = await earliest_fetch
-        await write_to_file(file_path, url, status_code)
+async def fetch_urls(
+        urls: list[str], file_path: str,
+        limit: int = 5, limit_per_host: int = 5,
+        resilience: Resilience | None = None
+    ) -> None:
+    sem = asyncio.Semaphore(limit)
 
+    async with (
+        make_session(limit, limit_per_host) as session,
+        ResultWriter(file_path) as writer,
+    ):
+        fetch_tasks = [fetch_url(url, session, sem, resilience) for url in urls]
 
-async def fetch_url(url: str, sem: asyncio.Semaphore) -> tuple[str, int]:
+        for earliest_fetch in asyncio.as_completed(fetch_tasks):
+            url, status_code = await earliest_fetch
+            await writer.write({url: status_code})
+
+
+@metrics.timed("async_http.fetch_url")
+async def fetch_url(
+        url: str, session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+        resilience: Resilience | None = None
+    ) -> tuple[str, int]:
     async with sem:
-        async with aiohttp.ClientSession() as session:
-            try:
-                r = await session.get(url)
-                status_code = r.status
-            except ClientConnectorDNSError:
-                status_code = 600
-            except ConnectionTimeoutError:
-                status_code = 601
-            except ClientConnectionError:
-                status_code = 0
-            
-            return url, status_code
-
-
-async def write_to_file(file_path: str, url: str, status_code: int) -> None:
-    entry = json.dumps({url: status_code})
-    entry_f = f"{entry}\n"
-    async with aiofiles.open(file_path, "a", encoding="utf-8") as file:
-        await file.write(entry_f)
+        try:
+            if resilience:
+                status_code = await resilience.call(
+                    urlsplit(url).hostname or url, partial(fetch_status, session, url)
+                )
+            else:
+                status_code = await fetch_status(session, url)
+        except CircuitOpenError:
+            status_code = 602
+        except ClientConnectorDNSError:
+            status_code = 600
+        except (ServerTimeoutError, asyncio.TimeoutError):
+            status_code = 601
+        except ClientConnectionError:
+            status_code = 0
+
+        return url, status_code
+
+
+async def fetch_status(session: aiohttp.ClientSession, url: str) -> int:
+    async with session.get(url) as r:
+        # only the status is needed, skip reading the body
+        r.release()
+        return r.status
+
+
+def make_resilience(hedge_after: float | None = None) -> Resilience:
+    return Resilience(
+        retry_on=(ClientConnectionError, asyncio.TimeoutError), hedge_after=hedge_after
+    )
+
+
+async def fetch_urls_resilient(urls: list[str], file_path: str) -> None:
+    resilience = make_resilience(hedge_after=1.0)
+    await fetch_urls(urls, file_path, resilience=resilience)
+    print(json.dumps(resilience.latency_report(), indent=2))
+    print(json.dumps(metrics.report(), indent=2))
 
 
 if __name__ == '__main__':
-    asyncio.run(fetch_urls(urls, './data/async_http/results.jsonl'))
+    metrics.enabled = True
+    asyncio.run(fetch_urls_resilient(urls, './data/async_http/results.jsonl'))
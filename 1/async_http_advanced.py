@@ -1,6 +1,9 @@
 import asyncio
+import hashlib
 import json
 from collections.abc import AsyncGenerator
+from functools import partial
+from urllib.parse import urlsplit
 
 import aiofiles
 import aiohttp
@@ -11,17 +14,70 @@ from aiohttp.client_exceptions import (
     ContentTypeError,
 )
 
+from adaptive_limiter import AdaptiveLimiter
+from checkpoint import BloomFilter, OffsetTracker, load_checkpoint, save_checkpoint
+from instrumentation import metrics
+from resilience import CircuitOpenError, Resilience
+from result_writer import ResultWriter
 
-async def fetch_urls(urls_file_path: str, result_file_path: str) -> None:
-    fetch_queue = asyncio.Queue(maxsize=5)
+CHECKPOINT_INTERVAL = 5
+CHUNK_SIZE = 64 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+async def fetch_urls(
+        urls_file_path: str, result_file_path: str,
+        limiter: AdaptiveLimiter | None = None,
+        body_mode: str = "json", max_body_size: int = MAX_BODY_SIZE,
+        checkpoint_path: str | None = None, dedupe: bool = False,
+        start: int = 0, end: int | None = None,
+        resilience: Resilience | None = None
+    ) -> None:
+    worker_count = limiter.max_limit if limiter else 2
+    fetch_queue = asyncio.Queue(maxsize=worker_count * 2 if limiter else 5)
     tasks: list[asyncio.Task] = []
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(3)) as session:
-        for _ in range(2):
-            task = asyncio.create_task(worker(fetch_queue, session, result_file_path))
+
+    resume_offset = start
+    if checkpoint_path:
+        resume_offset = max(start, load_checkpoint(checkpoint_path))
+    tracker = OffsetTracker(resume_offset) if checkpoint_path else None
+    seen = BloomFilter() if dedupe else None
+
+    async with (
+        aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(3)) as session,
+        ResultWriter(result_file_path) as writer,
+    ):
+        for _ in range(worker_count):
+            task = asyncio.create_task(
+                worker(
+                    fetch_queue, session, writer, limiter, body_mode, max_body_size,
+                    tracker, resilience
+                )
+            )
             tasks.append(task)
 
-        async for url in read_url(urls_file_path):
-            await fetch_queue.put(url)
+        if tracker:
+            checkpointer = asyncio.create_task(
+                checkpoint_loop(checkpoint_path, tracker, writer)
+            )
+
+        # with dedupe the finished prefix is re-read only to refill the filter
+        start_offset = start if seen else resume_offset
+        async for url, end_offset in read_url(urls_file_path, start_offset, end):
+            is_new = seen.add(url) if seen else True
+            if end_offset <= resume_offset:
+                continue
+
+            if tracker:
+                tracker.add(end_offset)
+            if is_new:
+                await fetch_queue.put((url, end_offset))
+            elif tracker:
+                tracker.complete(end_offset)
         
         await fetch_queue.join()
 
@@ -30,54 +86,189 @@ async def fetch_urls(urls_file_path: str, result_file_path: str) -> None:
     
         await asyncio.gather(*tasks, return_exceptions=True)
 
+        if tracker:
+            checkpointer.cancel()
+            await save_progress(checkpoint_path, tracker, writer)
+
+
+async def checkpoint_loop(path: str, tracker: OffsetTracker, writer: ResultWriter) -> None:
+    while True:
+        await asyncio.sleep(CHECKPOINT_INTERVAL)
+        await save_progress(path, tracker, writer)
+
+
+async def save_progress(path: str, tracker: OffsetTracker, writer: ResultWriter) -> None:
+    # results behind the watermark must reach disk before the offset does
+    offset = tracker.watermark
+    await writer.sync()
+    save_checkpoint(path, offset)
 
-async def worker(queue: asyncio.Queue, session: aiohttp.ClientSession, file_path: str):
+
+async def worker(
+        queue: asyncio.Queue, session: aiohttp.ClientSession, writer: ResultWriter,
+        limiter: AdaptiveLimiter | None = None,
+        body_mode: str = "json", max_body_size: int = MAX_BODY_SIZE,
+        tracker: OffsetTracker | None = None,
+        resilience: Resilience | None = None
+    ):
     while True:
-        url = await queue.get()
+        url, end_offset = await queue.get()
         
         try:
-            url, data = await fetch_url(url, session)
-            await write_to_file(file_path, url, data)
+            url, data = await fetch_url(
+                url, session, limiter, body_mode, max_body_size, resilience
+            )
+            await writer.write({"url": url, "content": data})
         except Exception as e:
-            await write_to_file(file_path, url, {"status": -1, "error": str(e)})
+            await writer.write({"url": url, "content": {"status": -1, "error": str(e)}})
         finally:
+            if tracker:
+                tracker.complete(end_offset)
             queue.task_done()
 
 
-async def fetch_url(url: str, session: aiohttp.ClientSession) -> tuple[str, dict]:
+@metrics.timed("async_http_advanced.fetch_url")
+async def fetch_url(
+        url: str, session: aiohttp.ClientSession,
+        limiter: AdaptiveLimiter | None = None,
+        body_mode: str = "json", max_body_size: int = MAX_BODY_SIZE,
+        resilience: Resilience | None = None
+    ) -> tuple[str, dict]:
+    host = urlsplit(url).hostname
+    start = await limiter.acquire(host) if limiter else 0.0
+    timed_out = False
+    fetch = partial(fetch_body, session, url, body_mode, max_body_size)
+
     try:
-        r = await session.get(url)
-        data = await r.json()
+        if resilience:
+            data = await resilience.call(host or url, fetch)
+        else:
+            data = await fetch()
+    except (ConnectionTimeoutError, asyncio.TimeoutError) as e:
+        timed_out = True
+        data = {"status": 0, "error": str(e)}
     except (
-        ClientConnectorDNSError, ConnectionTimeoutError, 
-        ContentTypeError, ClientConnectionError, asyncio.TimeoutError
+        ClientConnectorDNSError, ClientConnectionError, CircuitOpenError
     ) as e:
         data = {"status": 0, "error": str(e)}
+    finally:
+        if limiter:
+            await limiter.release(start, timed_out, host)
     
     return url, data
 
 
-async def write_to_file(file_path: str, url: str, data: dict) -> None:
-    entry = json.dumps(
-        {
-            "url": url,
-            "content": data
+async def fetch_body(
+        session: aiohttp.ClientSession, url: str, body_mode: str, max_body_size: int
+    ) -> dict:
+    async with session.get(url) as r:
+        try:
+            return await read_body(r, body_mode, max_body_size)
+        except (ContentTypeError, BodyTooLarge) as e:
+            # the host answered, so these are not failures worth retrying
+            return {"status": 0, "error": str(e)}
+
+
+async def read_body(
+        r: aiohttp.ClientResponse, body_mode: str, max_body_size: int
+    ) -> dict:
+    # bodies are read in chunks so no mode holds more than max_body_size
+    if body_mode == "json":
+        if "json" not in r.content_type:
+            raise ContentTypeError(
+                r.request_info, r.history, status=r.status, headers=r.headers,
+                message=f"Attempt to decode JSON with unexpected mimetype: {r.content_type}",
+            )
+        return json.loads(await read_capped(r, max_body_size))
+
+    if body_mode == "hash":
+        digest = hashlib.sha256()
+        size = 0
+        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+
+        return {"status": r.status, "size": size, "sha256": digest.hexdigest()}
+
+    if body_mode == "truncate":
+        body = bytearray()
+        truncated = False
+        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+            remaining = max_body_size - len(body)
+            body += chunk[:remaining]
+            if len(chunk) > remaining:
+                truncated = True
+                break
+
+        return {
+            "status": r.status,
+            "body": body.decode(r.charset or "utf-8", errors="replace"),
+            "truncated": truncated,
         }
-    )
-    entry_f = f"{entry}\n"
-    async with aiofiles.open(file_path, "a", encoding="utf-8") as file:
-        await file.write(entry_f)
+
+    raise ValueError(f"unknown body mode: {body_mode}")
 
 
-async def read_url(file_path: str) -> AsyncGenerator[str, str]:
-    async with aiofiles.open(file_path, "r") as file:
+async def read_capped(r: aiohttp.ClientResponse, max_body_size: int) -> bytes:
+    if r.content_length is not None and r.content_length > max_body_size:
+        raise BodyTooLarge(f"body of {r.content_length} bytes exceeds {max_body_size}")
+
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_body_size:
+            raise BodyTooLarge(f"body exceeds {max_body_size} bytes")
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+async def read_url(
+        file_path: str, offset: int = 0, end: int | None = None
+    ) -> AsyncGenerator[tuple[str, int], None]:
+    async with aiofiles.open(file_path, "rb") as file:
+        await file.seek(offset)
         async for line in file:
-            yield line.strip()
+            if end is not None and offset >= end:
+                break
+
+            offset += len(line)
+            url = line.strip().decode()
+            if url:
+                yield url, offset
+
+
+async def report_metrics(limiter: AdaptiveLimiter, interval: float = 5) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        print(json.dumps(limiter.metrics()))
+
+
+async def fetch_urls_adaptive(urls_file_path: str, result_file_path: str) -> None:
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=64, per_host_limit=8)
+    resilience = Resilience(
+        retry_on=(ClientConnectionError, asyncio.TimeoutError), hedge_after=1.0
+    )
+    reporter = asyncio.create_task(report_metrics(limiter))
+    try:
+        await fetch_urls(
+            urls_file_path, result_file_path, limiter,
+            checkpoint_path=f"{result_file_path}.checkpoint", dedupe=True,
+            resilience=resilience
+        )
+    finally:
+        reporter.cancel()
+
+    print(json.dumps(limiter.metrics()))
+    print(json.dumps(resilience.latency_report(), indent=2))
+    print(json.dumps(metrics.report(), indent=2))
 
 
 if __name__ == '__main__':
+    metrics.enabled = True
     asyncio.run(
-        fetch_urls(
+        fetch_urls_adaptive(
             './data/async_http_advanced/urls.txt',
             './data/async_http_advanced/results.jsonl'
         )
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+import async_http
+import async_http_advanced
+from adaptive_limiter import AdaptiveLimiter
+from resilience import Resilience, percentile_ms
+from web_application_benchmark import wait_until_up
+
+STUB_HOST = "127.0.0.1"
+STUB_PORT = 8095
+FETCHERS = ("async_http", "async_http_advanced")
+
+
+def run_stub(latency_ms: float, error_rate: float, body_size: int) -> None:
+    rnd = random.Random(42)
+
+    async def item(request: web.Request) -> web.Response:
+        # exponential latency and pareto body sizes give a realistic long tail
+        await asyncio.sleep(rnd.expovariate(1000 / latency_ms) if latency_ms else 0)
+        size = int(rnd.paretovariate(1.5) * body_size / 3)
+        status = 500 if rnd.random() < error_rate else 200
+        # status is echoed in the body since the advanced fetcher only keeps the content
+        body = {"id": request.match_info["id"], "status": status, "pad": "x" * size}
+        return web.json_response(body, status=status)
+
+    stub = web.Application()
+    stub.router.add_get("/item/{id}", item)
+    web.run_app(stub, host=STUB_HOST, port=STUB_PORT, print=None)
+
+
+def make_resilience() -> Resilience:
+    # no retries and no tripping, only latency and transport error recording
+    return Resilience(
+        retry_on=(aiohttp.ClientError, asyncio.TimeoutError),
+        retries=0, failure_threshold=sys.maxsize
+    )
+
+
+def count_errors(result_path: str) -> int:
+    # non-2xx answers and transport failures, which both fetchers record as status codes
+    errors = 0
+    with open(result_path, encoding="utf-8") as file:
+        for line in file:
+            entry = json.loads(line)
+            if "content" in entry:
+                status = entry["content"].get("status", 0)
+            else:
+                (status,) = entry.values()
+            if not 200 <= status < 300:
+                errors += 1
+
+    return errors
+
+
+async def run_fetcher(
+        fetcher: str, urls_path: str, result_path: str, concurrency: int
+    ) -> Resilience:
+    resilience = make_resilience()
+
+    if fetcher == "async_http":
+        with open(urls_path) as file:
+            urls = file.read().split()
+        await async_http.fetch_urls(
+            urls, result_path, limit=concurrency, limit_per_host=concurrency,
+            resilience=resilience
+        )
+    else:
+        limiter = AdaptiveLimiter(
+            initial_limit=concurrency, min_limit=concurrency, max_limit=concurrency
+        )
+        await async_http_advanced.fetch_urls(
+            urls_path, result_path, limiter, resilience=resilience
+        )
+
+    return resilience
+
+
+def run_once(fetcher: str, urls_path: str, concurrency: int, requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_path = os.path.join(tmp_dir, "results.jsonl")
+
+        start = time.perf_counter()
+        resilience = asyncio.run(run_fetcher(fetcher, urls_path, result_path, concurrency))
+        duration = time.perf_counter() - start
+        errors = count_errors(result_path)
+
+    latencies = sorted(resilience.latencies[STUB_HOST])
+    # ru_maxrss is in KiB on Linux
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "fetcher": fetcher,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "transport_errors": resilience.errors.get(STUB_HOST, 0),
+        "rps": round(requests / duration, 1),
+        "p50_ms": percentile_ms(latencies, 0.5),
+        "p90_ms": percentile_ms(latencies, 0.9),
+        "p99_ms": percentile_ms(latencies, 0.99),
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+    }))
+
+
+def benchmark(args: argparse.Namespace) -> None:
+    stub = subprocess.Popen([
+        sys.executable, __file__, "--stub",
+        "--latency-ms", str(args.latency_ms),
+        "--error-rate", str(args.error_rate),
+        "--body-size", str(args.body_size),
+    ])
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as urls_file:
+        for i in range(args.requests):
+            urls_file.write(f"http://{STUB_HOST}:{STUB_PORT}/item/{i}\n")
+
+    try:
+        asyncio.run(wait_until_up(STUB_PORT, STUB_HOST))
+
+        for fetcher in args.fetchers:
+            for concurrency in args.concurrency:
+                # a fresh process per run keeps peak RSS comparable
+                result = subprocess.run(
+                    [
+                        sys.executable, __file__, "--run", fetcher,
+                        "--urls", urls_file.name,
+                        "--concurrency", str(concurrency),
+                        "--requests", str(args.requests),
+                    ],
+                    capture_output=True, text=True, check=True,
+                )
+                line = result.stdout.strip().splitlines()[-1]
+                print(line)
+                if args.output:
+                    with open(args.output, "a", encoding="utf-8") as output:
+                        output.write(f"{line}\n")
+    finally:
+        stub.terminate()
+        stub.wait()
+        os.remove(urls_file.name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stub", action="store_true")
+    parser.add_argument("--run", choices=FETCHERS)
+    parser.add_argument("--urls")
+    parser.add_argument("--fetchers", nargs="+", choices=FETCHERS, default=list(FETCHERS))
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[2, 10, 50, 200])
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--body-size", type=int, default=1024)
+    parser.add_argument("--output", help="append JSON lines to this file")
+    args = parser.parse_args()
+
+    if args.stub:
+        run_stub(args.latency_ms, args.error_rate, args.body_size)
+    elif args.run:
+        run_once(args.run, args.urls, args.concurrency[0], args.requests)
+    else:
+        benchmark(args)
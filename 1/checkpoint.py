@@ -0,0 +1,62 @@
+import hashlib
+import json
+import math
+import os
+from collections import deque
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001) -> None:
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    # returns False if item was (probably) added before
+    def add(self, item: str) -> bool:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+
+        is_new = False
+        for i in range(self.hash_count):
+            bit = (h1 + i * h2) % self.size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                is_new = True
+
+        return is_new
+
+
+class OffsetTracker:
+    def __init__(self, offset: int = 0) -> None:
+        # every line ending at or before watermark has been processed
+        self.watermark = offset
+        self.pending: deque[int] = deque()
+        self.done: set[int] = set()
+
+    def add(self, end_offset: int) -> None:
+        self.pending.append(end_offset)
+
+    def complete(self, end_offset: int) -> None:
+        self.done.add(end_offset)
+
+        while self.pending and self.pending[0] in self.done:
+            self.watermark = self.pending.popleft()
+            self.done.remove(self.watermark)
+
+
+def load_checkpoint(path: str) -> int:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)["offset"]
+    except FileNotFoundError:
+        return 0
+
+
+def save_checkpoint(path: str, offset: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"offset": offset}, file)
+
+    os.replace(tmp_path, path)
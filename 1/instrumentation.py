@@ -0,0 +1,260 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from collections.abc import Callable
+from contextlib import contextmanager, nullcontext
+from multiprocessing.queues import SimpleQueue
+from time import perf_counter_ns
+
+# 2 ** SUB_BITS linear sub-buckets per power of two, ~3% relative error
+SUB_BITS = 5
+SUB_BUCKETS = 1 << SUB_BITS
+STOP = None
+
+
+def bucket_index(value: int) -> int:
+    if value < SUB_BUCKETS * 2:
+        return value
+
+    shift = value.bit_length() - SUB_BITS - 1
+    return (shift << SUB_BITS) + (value >> shift)
+
+
+def bucket_value(index: int) -> int:
+    if index < SUB_BUCKETS * 2:
+        return index
+
+    shift = (index >> SUB_BITS) - 1
+    mantissa = index - (shift << SUB_BITS)
+    # middle of the bucket
+    return (mantissa << shift) + (1 << shift >> 1)
+
+
+class Histogram:
+    def __init__(self) -> None:
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: int | None = None
+        self.max: int | None = None
+
+    def record(self, value: int) -> None:
+        index = bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int | None:
+        if not self.count:
+            return None
+
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(bucket_value(index), self.min), self.max)
+
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": self.buckets, "count": self.count, "total": self.total,
+            "min": self.min, "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls()
+        histogram.buckets = dict(data["buckets"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def summary(self) -> dict:
+        def ms(ns: int | None) -> float | None:
+            return None if ns is None else round(ns / 1e6, 3)
+
+        return {
+            "count": self.count,
+            "total_ms": ms(self.total),
+            "mean_ms": ms(self.total / self.count if self.count else None),
+            "min_ms": ms(self.min),
+            "p50_ms": ms(self.percentile(0.5)),
+            "p90_ms": ms(self.percentile(0.9)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max),
+        }
+
+
+class Timer:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self) -> "Timer":
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.instrumentation.record(self.name, perf_counter_ns() - self.start)
+
+
+DISABLED_TIMER = nullcontext()
+
+
+class Instrumentation:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.histograms: dict[str, Histogram] = {}
+        self.lock = threading.Lock()
+        # set in child processes, snapshots are sent to the parent through it
+        self.queue: SimpleQueue | None = None
+
+    def record(self, name: str, ns: int) -> None:
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(ns)
+
+    def timer(self, name: str) -> Timer | nullcontext:
+        if not self.enabled:
+            return DISABLED_TIMER
+
+        return Timer(self, name)
+
+    def timed(self, name: str | None = None):
+        def decorator(func: Callable) -> Callable:
+            timer_name = name or func.__qualname__
+
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+
+                    start = perf_counter_ns()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.record(timer_name, perf_counter_ns() - start)
+
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                start = perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(timer_name, perf_counter_ns() - start)
+
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> dict[str, dict]:
+        with self.lock:
+            return {name: h.to_dict() for name, h in self.histograms.items()}
+
+    def merge(self, snapshot: dict[str, dict]) -> None:
+        with self.lock:
+            for name, data in snapshot.items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.merge(Histogram.from_dict(data))
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms = {}
+
+    def report(self) -> dict[str, dict]:
+        with self.lock:
+            return {name: h.summary() for name, h in self.histograms.items()}
+
+    @contextmanager
+    def children(self):
+        # parent side, yields the queue to hand to child processes or None when disabled
+        if not self.enabled:
+            yield None
+            return
+
+        queue = multiprocessing.SimpleQueue()
+
+        def collect() -> None:
+            while (snapshot := queue.get()) is not STOP:
+                self.merge(snapshot)
+
+        collector = threading.Thread(target=collect, daemon=True)
+        collector.start()
+        try:
+            yield queue
+        finally:
+            queue.put(STOP)
+            collector.join()
+            queue.close()
+
+    def attach(self, queue: SimpleQueue | None) -> None:
+        # child side, drops whatever was inherited through fork
+        self.enabled = queue is not None
+        self.queue = queue
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def flush(self) -> None:
+        # SimpleQueue.put writes synchronously, so the snapshot is in the pipe on return
+        if self.queue is None or not self.histograms:
+            return
+
+        self.queue.put(self.snapshot())
+        self.reset()
+
+
+metrics = Instrumentation()
+
+
+if __name__ == "__main__":
+    for value in (0, 1, 63, 64, 65, 1000, 10**6, 10**9 + 7):
+        low = bucket_value(bucket_index(value))
+        assert abs(low - value) <= max(value / SUB_BUCKETS, 1), (value, low)
+
+    instrumentation = Instrumentation()
+    with instrumentation.timer("disabled"):
+        pass
+    assert instrumentation.report() == {}
+
+    instrumentation.enabled = True
+    for ns in range(1, 10001):
+        instrumentation.record("linear", ns * 1000)
+    summary = instrumentation.report()["linear"]
+    assert summary["count"] == 10000
+    assert abs(summary["p50_ms"] - 5.0) < 5.0 / SUB_BUCKETS
+    assert abs(summary["p99_ms"] - 9.9) < 9.9 / SUB_BUCKETS
+
+    other = Instrumentation(enabled=True)
+    other.merge(instrumentation.snapshot())
+    assert other.report() == instrumentation.report()
+    print(summary)
@@ -1,46 +1,423 @@
+import asyncio
+import sys
+import threading
+import time
 import unittest.mock
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial, wraps
+from typing import Any, NamedTuple
 
+MISSING = object()
+KWARGS_MARK = object()
 
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+
+
+class BaseCache(ABC):
+    # true for caches that do their own locking, see make_thread_safe_wrapper
+    thread_safe = False
+
+    def __init__(
+            self, maxsize: int | None = 128, *,
+            ttl: float | None = None, max_bytes: int | None = None,
+            sizer: Callable[[Any], int] = sys.getsizeof
+        ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+
+        self.data: dict[Hashable, Any] = {}
+        self.expires_at: dict[Hashable, float] = {}
+        self.sizes: dict[Hashable, int] = {}
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        self.record(key)
+        value = self.data.get(key, MISSING)
+
+        if (
+            value is not MISSING and self.ttl is not None
+            and self.expires_at[key] <= time.monotonic()
+        ):
+            self.delete(key)
+            value = MISSING
+
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.touch(key)
+
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizer(value)
+            if size > self.max_bytes:
+                return
+
+        if key in self.data:
+            self.delete(key)
+        elif self.is_full(size) and not self.admit(key):
+            return
+
+        while self.data and self.is_full(size):
+            self.delete(self.victim())
+
+        self.insert(key, value)
+
+        if self.ttl is not None:
+            self.expires_at[key] = time.monotonic() + self.ttl
+        if self.max_bytes is not None:
+            self.sizes[key] = size
+            self.currbytes += size
+
+    def delete(self, key: Hashable) -> None:
+        self.remove(key)
+        self.expires_at.pop(key, None)
+        self.currbytes -= self.sizes.pop(key, 0)
+
+    def is_full(self, size: int) -> bool:
+        if self.maxsize is not None and len(self.data) >= self.maxsize:
+            return True
+
+        return self.max_bytes is not None and self.currbytes + size > self.max_bytes
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.expires_at.clear()
+        self.sizes.clear()
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # policy hooks
+
+    def record(self, key: Hashable) -> None:
+        pass
+
+    def admit(self, key: Hashable) -> bool:
+        return True
+
+    @abstractmethod
+    def insert(self, key: Hashable, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, key: Hashable) -> None:
+        ...
+
+    @abstractmethod
+    def touch(self, key: Hashable) -> None:
+        ...
+
+    @abstractmethod
+    def victim(self) -> Hashable:
+        ...
+
+
+class LRUCache(BaseCache):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.data: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def insert(self, key: Hashable, value: Any) -> None:
+        self.data[key] = value
+
+    def remove(self, key: Hashable) -> None:
+        del self.data[key]
+
+    def touch(self, key: Hashable) -> None:
+        self.data.move_to_end(key)
+
+    def victim(self) -> Hashable:
+        return next(iter(self.data))
+
+
+class LFUCache(BaseCache):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.freqs: dict[Hashable, int] = {}
+        # frequency -> keys in least recently used order
+        self.buckets: dict[int, dict[Hashable, None]] = {}
+        self.min_freq = 0
+
+    def insert(self, key: Hashable, value: Any) -> None:
+        self.data[key] = value
+        self.freqs[key] = 1
+        self.buckets.setdefault(1, {})[key] = None
+        self.min_freq = 1
+
+    def remove(self, key: Hashable) -> None:
+        del self.data[key]
+        self._unlink(key, self.freqs.pop(key))
+
+    def touch(self, key: Hashable) -> None:
+        freq = self.freqs[key]
+        self._unlink(key, freq)
+        if self.min_freq == freq and freq not in self.buckets:
+            self.min_freq = freq + 1
+
+        self.freqs[key] = freq + 1
+        self.buckets.setdefault(freq + 1, {})[key] = None
+
+    def victim(self) -> Hashable:
+        if self.min_freq not in self.buckets:
+            self.min_freq = min(self.buckets)
+
+        return next(iter(self.buckets[self.min_freq]))
+
+    def clear(self) -> None:
+        super().clear()
+        self.freqs.clear()
+        self.buckets.clear()
+        self.min_freq = 0
+
+    def _unlink(self, key: Hashable, freq: int) -> None:
+        bucket = self.buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[freq]
+
+
+class CountMinSketch:
+    depth = 4
+
+    def __init__(self, width: int) -> None:
+        self.width = 1 << max(width - 1, 15).bit_length()
+        self.mask = self.width - 1
+        self.counters = [0] * (self.depth * self.width)
+        self.additions = 0
+        self.sample_size = 10 * self.width
+
+    def indexes(self, key: Hashable) -> tuple[int, int, int, int]:
+        h = (hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width, mask = self.width, self.mask
+        return (
+            h1 & mask,
+            width + ((h1 + h2) & mask),
+            2 * width + ((h1 + 2 * h2) & mask),
+            3 * width + ((h1 + 3 * h2) & mask),
+        )
+
+    def add(self, key: Hashable) -> None:
+        counters = self.counters
+        for i in self.indexes(key):
+            counters[i] += 1
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.counters = [c >> 1 for c in counters]
+            self.additions >>= 1
+
+    def estimate(self, key: Hashable) -> int:
+        a, b, c, d = self.indexes(key)
+        counters = self.counters
+        return min(counters[a], counters[b], counters[c], counters[d])
+
+    def clear(self) -> None:
+        self.counters = [0] * (self.depth * self.width)
+        self.additions = 0
+
+
+class TinyLFUCache(LRUCache):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.sketch = CountMinSketch(self.maxsize or 1024)
+
+    def record(self, key: Hashable) -> None:
+        self.sketch.add(key)
+
+    def admit(self, key: Hashable) -> bool:
+        if not self.data:
+            return True
+
+        return self.sketch.estimate(key) > self.sketch.estimate(self.victim())
+
+    def clear(self) -> None:
+        super().clear()
+        self.sketch.clear()
+
+
+POLICIES: dict[str, type[BaseCache]] = {
+    "lru": LRUCache,
+    "lfu": LFUCache,
+    "tinylfu": TinyLFUCache,
+}
+
+
+# registry of the cache behind every decorated function, keyed by get_func_id
 class CacheMock:
-    cached_data = {}
+    cached_data: dict[str, BaseCache] = {}
 
     @classmethod
-    def get(cls, func_id, args_key):
-        if func_id not in cls.cached_data:
-            return None
+    def register(cls, func_id: str, cache: BaseCache) -> BaseCache:
+        cls.cached_data[func_id] = cache
+        return cache
 
-        return cls.cached_data[func_id].get(args_key)
 
-    @classmethod
-    def set(cls, func_id: str, args_key, value) -> None:
-        if func_id not in cls.cached_data:
-            cls.cached_data[func_id] = {}
+def make_key(args: tuple, kwargs: dict) -> Hashable:
+    if not kwargs:
+        return args
 
-        cls.cached_data[func_id][args_key] = value
-    
-    @classmethod
-    def get_size(cls, func_id: str) -> int:
-        return len(cls.cached_data.get(func_id, []))
+    return (*args, KWARGS_MARK, *kwargs.items())
 
 
-def lru_cache(maxsize: int = 4):
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            func_name = getattr(func, "__name__", str(func))
-            args_key = (*args, *kwargs)
+def get_func_id(func) -> str:
+    module = getattr(func, "__module__", None)
+    qualname = getattr(func, "__qualname__", None)
+    if module is None or qualname is None:
+        return str(func)
+
+    return f"{module}.{qualname}"
+
+
+def make_wrapper(func: Callable, cache: BaseCache) -> Callable:
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        args_key = make_key(args, kwargs)
+
+        res = cache.get(args_key)
+
+        if res is MISSING:
+            res = func(*args, **kwargs)
+            cache.set(args_key, res)
+
+        return res
+
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+def make_thread_safe_wrapper(func: Callable, cache: BaseCache) -> Callable:
+    lock = threading.RLock()
+    in_flight: dict[Hashable, Future] = {}
+    # a self-locking cache may do I/O, keep it out of the in_flight lock
+    cache_lock = nullcontext() if cache.thread_safe else lock
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        args_key = make_key(args, kwargs)
+
+        with cache_lock:
+            res = cache.get(args_key)
+            if res is not MISSING:
+                return res
+
+            with lock:
+                future = in_flight.get(args_key)
+                is_leader = future is None
+                if is_leader:
+                    future = in_flight[args_key] = Future()
 
-            res = CacheMock.get(func_name, args_key)
+        if not is_leader:
+            return future.result()
 
-            if res is None:
-                res = func(*args, **kwargs)
-            
-            size = CacheMock.get_size(func_name)
-            if maxsize >= size:
-                CacheMock.set(func_name, args_key, res)
+        try:
+            res = func(*args, **kwargs)
+        except BaseException as e:
+            with lock:
+                del in_flight[args_key]
+            future.set_exception(e)
+            raise
 
+        with cache_lock:
+            cache.set(args_key, res)
+            with lock:
+                del in_flight[args_key]
+        future.set_result(res)
+
+        return res
+
+    def cache_info() -> CacheInfo:
+        with cache_lock:
+            return cache.info()
+
+    def cache_clear() -> None:
+        with cache_lock:
+            cache.clear()
+
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+def make_async_wrapper(func: Callable, cache: BaseCache) -> Callable:
+    in_flight: dict[Hashable, asyncio.Task] = {}
+
+    def on_done(args_key: Hashable, task: asyncio.Task) -> None:
+        del in_flight[args_key]
+        if not task.cancelled() and task.exception() is None:
+            cache.set(args_key, task.result())
+
+    @wraps(func)
+    async def async_wrapper(*args, **kwargs):
+        args_key = make_key(args, kwargs)
+
+        res = cache.get(args_key)
+        if res is not MISSING:
             return res
 
-        return wrapper
+        task = in_flight.get(args_key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            in_flight[args_key] = task
+            task.add_done_callback(partial(on_done, args_key))
+
+        # shield so a cancelled caller does not cancel the shared computation
+        return await asyncio.shield(task)
+
+    async_wrapper.cache_info = cache.info
+    async_wrapper.cache_clear = cache.clear
+    return async_wrapper
+
+
+def cache_wrapper(func: Callable, cache: BaseCache, thread_safe: bool = False) -> Callable:
+    if asyncio.iscoroutinefunction(func):
+        return make_async_wrapper(func, cache)
+    if thread_safe:
+        return make_thread_safe_wrapper(func, cache)
+    return make_wrapper(func, cache)
+
+
+def lru_cache(
+        maxsize: int | None = 4, *,
+        policy: str = "lru", ttl: float | None = None,
+        max_bytes: int | None = None, sizer: Callable[[Any], int] = sys.getsizeof,
+        thread_safe: bool = False
+    ):
+    cache_cls = POLICIES[policy]
+
+    def decorator(func):
+        func_id = get_func_id(func)
+        cache = CacheMock.register(
+            func_id, cache_cls(maxsize, ttl=ttl, max_bytes=max_bytes, sizer=sizer)
+        )
+        return cache_wrapper(func, cache, thread_safe)
     return decorator
 
 
@@ -67,6 +444,9 @@ if __name__ == '__main__':
     assert multiply(3, 4) == 12
 
     assert sum_many(1, 2, c=3, d=4) == 10
+    assert sum_many(1, 2, c=4, d=3) == 10
+    assert sum_many(1, 2, c=5, d=5) == 13
+    assert sum_many.cache_info() == CacheInfo(0, 3, 4, 3)
 
     mocked_func = unittest.mock.Mock()
     mocked_func.side_effect = [1, 2, 3, 4]
@@ -80,3 +460,109 @@ if __name__ == '__main__':
     assert decorated(5, 6) == 3
     assert decorated(1, 2) == 4
     assert mocked_func.call_count == 4
+    assert decorated.cache_info() == CacheInfo(3, 4, 2, 2)
+
+    # recently used keys survive eviction
+    mocked_func = unittest.mock.Mock()
+    mocked_func.side_effect = [1, 2, 3]
+
+    decorated = lru_cache(maxsize=2)(mocked_func)
+    assert decorated(1) == 1
+    assert decorated(2) == 2
+    assert decorated(1) == 1
+    assert decorated(3) == 3
+    assert decorated(1) == 1
+    assert mocked_func.call_count == 3
+
+    # cached None is a hit
+    mocked_func = unittest.mock.Mock(return_value=None)
+
+    decorated = lru_cache(maxsize=2)(mocked_func)
+    assert decorated(1) is None
+    assert decorated(1) is None
+    assert mocked_func.call_count == 1
+
+    decorated.cache_clear()
+    assert decorated.cache_info() == CacheInfo(0, 0, 2, 0)
+
+    # concurrent thread misses on one key run the function once
+    slow_calls = []
+
+    @lru_cache(maxsize=2, thread_safe=True)
+    def slow_square(a: int) -> int:
+        slow_calls.append(a)
+        time.sleep(0.1)
+        return a * a
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(slow_square, [3] * 8))
+    assert results == [9] * 8
+    assert slow_calls == [3]
+
+    # concurrent coroutine misses on one key await one computation
+    async_calls = []
+
+    @lru_cache(maxsize=2)
+    async def async_square(a: int) -> int:
+        async_calls.append(a)
+        await asyncio.sleep(0.1)
+        return a * a
+
+    async def run_async_square() -> list[int]:
+        return await asyncio.gather(*(async_square(4) for _ in range(8)))
+
+    assert asyncio.run(run_async_square()) == [16] * 8
+    assert asyncio.run(run_async_square()) == [16] * 8
+    assert async_calls == [4]
+
+    # entries expire lazily after ttl
+    mocked_func = unittest.mock.Mock()
+    mocked_func.side_effect = [1, 2]
+
+    decorated = lru_cache(maxsize=2, ttl=0.05)(mocked_func)
+    assert decorated(1) == 1
+    assert decorated(1) == 1
+    time.sleep(0.1)
+    assert decorated(1) == 2
+    assert mocked_func.call_count == 2
+
+    # max_bytes evicts by weight, oversized values are not cached
+    mocked_func = unittest.mock.Mock()
+    mocked_func.side_effect = lambda n: "x" * n
+
+    decorated = lru_cache(maxsize=None, max_bytes=10, sizer=len)(mocked_func)
+    decorated(4)
+    decorated(5)
+    decorated(3)
+    assert decorated.cache_info().currsize == 2
+    decorated(11)
+    assert decorated.cache_info().currsize == 2
+    decorated(5)
+    decorated(3)
+    assert mocked_func.call_count == 4
+
+    # lfu keeps frequently used keys over recently used ones
+    mocked_func = unittest.mock.Mock()
+    mocked_func.side_effect = lambda n: n
+
+    decorated = lru_cache(maxsize=2, policy="lfu")(mocked_func)
+    decorated(1)
+    decorated(1)
+    decorated(2)
+    decorated(3)
+    decorated(1)
+    assert mocked_func.call_count == 3
+
+    # tinylfu refuses one-off keys when full
+    mocked_func = unittest.mock.Mock()
+    mocked_func.side_effect = lambda n: n
+
+    decorated = lru_cache(maxsize=2, policy="tinylfu")(mocked_func)
+    for _ in range(3):
+        decorated(1)
+        decorated(2)
+    for n in range(3, 10):
+        decorated(n)
+    decorated(1)
+    decorated(2)
+    assert mocked_func.call_count == 9
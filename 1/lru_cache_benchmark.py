@@ -0,0 +1,57 @@
+import itertools
+import random
+from time import perf_counter
+
+from lru_cache import MISSING, POLICIES, BaseCache
+
+
+def zipf_trace(n_keys: int, length: int, s: float = 0.99, seed: int = 42) -> list[int]:
+    rnd = random.Random(seed)
+    weights = [1 / rank ** s for rank in range(1, n_keys + 1)]
+    cum_weights = list(itertools.accumulate(weights))
+    keys = list(range(n_keys))
+    rnd.shuffle(keys)
+
+    return rnd.choices(keys, cum_weights=cum_weights, k=length)
+
+
+def value_sizes(n_keys: int, seed: int = 42) -> dict[int, int]:
+    # mostly small values with a long tail of large payloads
+    rnd = random.Random(seed)
+    return {key: int(rnd.paretovariate(1.2) * 100) for key in range(n_keys)}
+
+
+def run(cache: BaseCache, trace: list[int], sizes: dict[int, int]) -> tuple[float, float]:
+    start = perf_counter()
+    for key in trace:
+        if cache.get(key) is MISSING:
+            cache.set(key, sizes[key])
+    duration = perf_counter() - start
+
+    info = cache.info()
+    hit_ratio = info.hits / (info.hits + info.misses)
+    return hit_ratio, len(trace) / duration
+
+
+if __name__ == "__main__":
+    n_keys = 10_000
+    maxsize = 500
+    trace = zipf_trace(n_keys, 500_000)
+    sizes = value_sizes(n_keys)
+    max_bytes = maxsize * sorted(sizes.values())[n_keys // 2]
+
+    def sizer(value: int) -> int:
+        return value
+
+    configs: dict[str, tuple[str, dict]] = {}
+    for policy in POLICIES:
+        configs[policy] = (policy, {"maxsize": maxsize})
+        configs[f"{policy} ttl=0.5s"] = (policy, {"maxsize": maxsize, "ttl": 0.5})
+        configs[f"{policy} max_bytes={max_bytes}"] = (
+            policy, {"maxsize": None, "max_bytes": max_bytes, "sizer": sizer}
+        )
+
+    print(f"{'config':<30}{'hit ratio':>12}{'ops/sec':>14}")
+    for name, (policy, kwargs) in configs.items():
+        hit_ratio, ops = run(POLICIES[policy](**kwargs), trace, sizes)
+        print(f"{name:<30}{hit_ratio:>12.3f}{ops:>14,.0f}")
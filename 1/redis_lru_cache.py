@@ -0,0 +1,228 @@
+import hashlib
+import pickle
+import sys
+import threading
+import time
+import unittest.mock
+from collections.abc import Callable, Hashable
+from typing import Any
+from uuid import uuid4
+
+from redis import Redis
+
+from lru_cache import (
+    MISSING,
+    POLICIES,
+    BaseCache,
+    CacheInfo,
+    CacheMock,
+    cache_wrapper,
+    get_func_id,
+)
+
+
+class Invalidator:
+    channel = "lru_cache:invalidate"
+    instances: dict[int, "Invalidator"] = {}
+
+    def __init__(self, redis_cli: Redis) -> None:
+        self.redis_cli = redis_cli
+        self.origin = uuid4().hex.encode()
+        self.caches: dict[bytes, "RedisTierCache"] = {}
+        self.thread = None
+
+    @classmethod
+    def for_client(cls, redis_cli: Redis) -> "Invalidator":
+        if id(redis_cli) not in cls.instances:
+            cls.instances[id(redis_cli)] = cls(redis_cli)
+
+        return cls.instances[id(redis_cli)]
+
+    def register(self, func_id: bytes, cache: "RedisTierCache") -> None:
+        self.caches[func_id] = cache
+
+        if self.thread is None:
+            pubsub = self.redis_cli.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self.on_message})
+            self.thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def message(self, func_id: bytes, field: bytes = b"") -> bytes:
+        # empty field invalidates the whole function cache
+        return b"|".join((self.origin, func_id, field))
+
+    def on_message(self, message: dict) -> None:
+        origin, func_id, field = message["data"].split(b"|", 2)
+        if origin == self.origin:
+            return
+
+        cache = self.caches.get(func_id)
+        if cache is not None:
+            cache.invalidate_local(field)
+
+
+# Values are written as serializer.dumps((expires_at, value)) and read back with
+# serializer.loads. The default is pickle, so anyone who can write to the Redis keys
+# can run code in every process using the cache. Only share the instance with
+# trusted clients, or pass a data-only serializer such as json.
+class RedisTierCache:
+    # L1 has its own lock, Redis calls run outside the wrapper lock
+    thread_safe = True
+
+    def __init__(
+            self, redis_cli: Redis, func_id: str, l1: BaseCache,
+            ex: int | None = None, ttl: float | None = None, serializer: Any = pickle
+        ) -> None:
+        self.redis_cli = redis_cli
+        self.func_id = func_id.encode()
+        self.name_key = f"lru_cache:{func_id}"
+        self.l1 = l1
+        self.ex = ex
+        self.ttl = ttl
+        self.serializer = serializer
+        self.lock = threading.Lock()
+        self.l2_hits = 0
+
+        self.invalidator = Invalidator.for_client(redis_cli)
+        self.invalidator.register(self.func_id, self)
+
+    def get(self, key: Hashable) -> Any:
+        field = self.make_field(key)
+
+        with self.lock:
+            value = self.l1.get(field)
+        if value is not MISSING:
+            return value
+
+        raw = self.redis_cli.hget(self.name_key, field)
+        if raw is None:
+            return MISSING
+
+        # wall clock, the expiry is shared between processes and hosts
+        expires_at, value = self.serializer.loads(raw)
+        if expires_at is not None:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                self.redis_cli.hdel(self.name_key, field)
+                return MISSING
+
+        self.l2_hits += 1
+        with self.lock:
+            self.l1.set(field, value)
+            # L1 must not outlive the L2 entry it was filled from
+            if expires_at is not None and field in self.l1.expires_at:
+                self.l1.expires_at[field] = time.monotonic() + remaining
+
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        field = self.make_field(key)
+
+        with self.lock:
+            self.l1.set(field, value)
+
+        with self.redis_cli.pipeline(transaction=False) as pipe:
+            expires_at = time.time() + self.ttl if self.ttl is not None else None
+            pipe.hset(self.name_key, field, self.serializer.dumps((expires_at, value)))
+            if self.ex is not None:
+                pipe.expire(self.name_key, self.ex)
+            pipe.publish(Invalidator.channel, self.invalidator.message(self.func_id, field))
+            pipe.execute()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.l1.clear()
+        self.l2_hits = 0
+
+        with self.redis_cli.pipeline(transaction=False) as pipe:
+            pipe.delete(self.name_key)
+            pipe.publish(Invalidator.channel, self.invalidator.message(self.func_id))
+            pipe.execute()
+
+    def invalidate_local(self, field: bytes) -> None:
+        with self.lock:
+            stale = list(self.l1.data) if not field else [field]
+            for stale_field in stale:
+                if stale_field in self.l1.data:
+                    self.l1.delete(stale_field)
+
+    def info(self) -> CacheInfo:
+        with self.lock:
+            l1_info = self.l1.info()
+
+        return CacheInfo(
+            l1_info.hits + self.l2_hits, l1_info.misses - self.l2_hits,
+            l1_info.maxsize, l1_info.currsize
+        )
+
+    def __len__(self) -> int:
+        return len(self.l1)
+
+    @staticmethod
+    def make_field(key: Hashable) -> bytes:
+        return hashlib.blake2b(
+            pickle.dumps(key, pickle.HIGHEST_PROTOCOL), digest_size=16
+        ).digest()
+
+
+def redis_lru_cache(
+        redis_cli: Redis, maxsize: int | None = 4, *,
+        ex: int | None = None, policy: str = "lru", ttl: float | None = None,
+        max_bytes: int | None = None, sizer: Callable[[Any], int] = sys.getsizeof,
+        thread_safe: bool = False, serializer: Any = pickle
+    ):
+    # fields and values are raw bytes, a decoding client breaks both reads and pubsub
+    if redis_cli.get_encoder().decode_responses:
+        raise ValueError("redis_lru_cache needs a client with decode_responses=False")
+
+    cache_cls = POLICIES[policy]
+
+    def decorator(func):
+        func_id = get_func_id(func)
+        l1 = cache_cls(maxsize, ttl=ttl, max_bytes=max_bytes, sizer=sizer)
+        cache = CacheMock.register(
+            func_id, RedisTierCache(redis_cli, func_id, l1, ex, ttl, serializer)
+        )
+        return cache_wrapper(func, cache, thread_safe)
+    return decorator
+
+
+if __name__ == '__main__':
+    # two clients stand in for two worker processes
+    redis_cli_1 = Redis(host='localhost', port=6379)
+    redis_cli_2 = Redis(host='localhost', port=6379)
+
+    mocked_func = unittest.mock.Mock()
+    mocked_func.side_effect = lambda a, b: a + b
+
+    worker_1 = redis_lru_cache(redis_cli_1, maxsize=2, ex=60)(mocked_func)
+    worker_1.cache_clear()
+    worker_2 = redis_lru_cache(redis_cli_2, maxsize=2, ex=60)(mocked_func)
+
+    assert worker_1(1, 2) == 3
+    assert worker_2(1, 2) == 3
+    assert worker_2(1, 2) == 3
+    assert mocked_func.call_count == 1
+    assert worker_2.cache_info() == CacheInfo(2, 0, 2, 1)
+
+    worker_1.cache_clear()
+    time.sleep(0.1)
+    assert worker_2.cache_info().currsize == 0
+    assert worker_2(1, 2) == 3
+    assert mocked_func.call_count == 2
+
+    ttl_func = unittest.mock.Mock()
+    ttl_func.side_effect = lambda a: a * 2
+
+    worker_3 = redis_lru_cache(redis_cli_1, ttl=0.05)(ttl_func)
+    worker_3.cache_clear()
+    assert worker_3(2) == 4
+    time.sleep(0.1)
+    assert worker_3(2) == 4
+    assert ttl_func.call_count == 2
+
+    try:
+        redis_lru_cache(Redis(host='localhost', port=6379, decode_responses=True))
+    except ValueError:
+        pass
+    else:
+        assert False, "decode_responses=True must be rejected"
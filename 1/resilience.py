@@ -0,0 +1,179 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+
+        # half-open: let a single probe through
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def abort_probe(self) -> None:
+        # the probe ended without a verdict, let the next call probe again
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Resilience:
+    def __init__(
+            self, retry_on: tuple[type[BaseException], ...] = (ConnectionError, TimeoutError),
+            retries: int = 2, backoff_base: float = 0.1, backoff_cap: float = 2.0,
+            hedge_after: float | None = None,
+            failure_threshold: int = 5, reset_timeout: float = 30
+        ) -> None:
+        self.retry_on = retry_on
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_after = hedge_after
+
+        self.breakers: defaultdict[str, CircuitBreaker] = defaultdict(
+            lambda: CircuitBreaker(failure_threshold, reset_timeout)
+        )
+        self.latencies: defaultdict[str, list[float]] = defaultdict(list)
+        self.errors: defaultdict[str, int] = defaultdict(int)
+
+    async def call(self, host: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        breaker = self.breakers[host]
+        delay = self.backoff_base
+
+        for retry in range(self.retries + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit open for {host}")
+
+            start = time.perf_counter()
+            try:
+                result = await self.hedged(attempt)
+            except self.retry_on:
+                breaker.record_failure()
+                self.errors[host] += 1
+                if retry == self.retries:
+                    raise
+
+                # decorrelated jitter
+                delay = min(self.backoff_cap, random.uniform(self.backoff_base, delay * 3))
+                await asyncio.sleep(delay)
+            except BaseException:
+                # errors outside retry_on and cancellation must not leave a probe pending
+                breaker.abort_probe()
+                raise
+            else:
+                breaker.record_success()
+                self.latencies[host].append(time.perf_counter() - start)
+                return result
+
+    async def hedged(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        if self.hedge_after is None:
+            return await attempt()
+
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                # slow first attempt, race a second one against it
+                tasks.append(asyncio.ensure_future(attempt()))
+
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def latency_report(self) -> dict[str, dict]:
+        report = {}
+        for host in self.latencies.keys() | self.errors.keys():
+            latencies = sorted(self.latencies.get(host, []))
+            report[host] = {
+                "ok": len(latencies),
+                "errors": self.errors.get(host, 0),
+                "p50_ms": percentile_ms(latencies, 0.5),
+                "p99_ms": percentile_ms(latencies, 0.99),
+            }
+
+        return report
+
+
+def percentile_ms(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+
+    return round(sorted_values[int(q * (len(sorted_values) - 1))] * 1000, 2)
+
+
+if __name__ == "__main__":
+    async def main() -> None:
+        calls = 0
+
+        async def failing() -> None:
+            nonlocal calls
+            calls += 1
+            raise ConnectionError("down")
+
+        resilience = Resilience(retries=3, backoff_base=0.2, failure_threshold=10)
+        start = time.perf_counter()
+        try:
+            await resilience.call("host", failing)
+        except ConnectionError:
+            pass
+        # every retry sleeps at least backoff_base
+        assert time.perf_counter() - start >= 3 * 0.2
+        assert calls == 4
+        assert resilience.errors["host"] == 4
+
+        async def broken() -> None:
+            raise ValueError("not retried")
+
+        breaker = resilience.breakers["probe"]
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout
+        try:
+            await resilience.call("probe", broken)
+        except ValueError:
+            pass
+        # the probe ended on an error outside retry_on, the next call may probe again
+        assert not breaker.probing
+        assert breaker.allow()
+
+    asyncio.run(main())
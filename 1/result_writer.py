@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+
+import aiofiles
+
+STOP = None
+
+
+class ResultWriter:
+    def __init__(
+            self, file_path: str, max_queue: int = 10_000,
+            flush_lines: int = 1000, flush_interval: float = 1.0
+        ) -> None:
+        self.file_path = file_path
+        self.queue: asyncio.Queue[str | asyncio.Future | None] = asyncio.Queue(maxsize=max_queue)
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.lines_written = 0
+
+    async def __aenter__(self) -> "ResultWriter":
+        self.file = await aiofiles.open(self.file_path, "a", encoding="utf-8")
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            await self.put(STOP)
+            await self.task
+        finally:
+            await self.file.close()
+
+    async def write(self, entry: dict) -> None:
+        await self.put(json.dumps(entry))
+
+    async def sync(self) -> None:
+        # resolves once every line written before the call is flushed
+        synced = asyncio.get_running_loop().create_future()
+        await self.put(synced)
+        await asyncio.wait((synced, self.task), return_when=asyncio.FIRST_COMPLETED)
+        if not synced.done():
+            synced.cancel()
+            self.task.result()
+
+    async def put(self, line: str | asyncio.Future | None) -> None:
+        if self.task.done():
+            # re-raises the writer's error, nothing would read the line otherwise
+            self.task.result()
+            raise RuntimeError("result writer is closed")
+
+        if not self.queue.full():
+            self.queue.put_nowait(line)
+            return
+
+        # block producers while the queue is full, unless the writer task dies
+        put = asyncio.ensure_future(self.queue.put(line))
+        await asyncio.wait((put, self.task), return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self.task.result()
+
+    async def run(self) -> None:
+        buffer: list[str] = []
+        last_flush = time.monotonic()
+
+        while True:
+            if buffer:
+                timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0)
+                try:
+                    line = await asyncio.wait_for(self.queue.get(), timeout)
+                except TimeoutError:
+                    line = ""
+            else:
+                line = await self.queue.get()
+
+            if line is STOP:
+                await self.flush(buffer)
+                return
+            if isinstance(line, asyncio.Future):
+                await self.flush(buffer)
+                last_flush = time.monotonic()
+                line.set_result(None)
+                continue
+            if line:
+                buffer.append(line)
+
+            if (
+                len(buffer) >= self.flush_lines
+                or time.monotonic() - last_flush >= self.flush_interval
+            ):
+                await self.flush(buffer)
+                last_flush = time.monotonic()
+
+    async def flush(self, buffer: list[str]) -> None:
+        if not buffer:
+            return
+
+        await self.file.write("\n".join(buffer) + "\n")
+        await self.file.flush()
+        self.lines_written += len(buffer)
+        buffer.clear()
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import shutil
+from multiprocessing import Pool as MultiprocessingPool
+from multiprocessing import cpu_count
+
+from adaptive_limiter import AdaptiveLimiter
+from async_http_advanced import fetch_urls
+
+
+def shard_ranges(file_path: str, shards: int) -> list[tuple[int, int]]:
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+
+    with open(file_path, "rb") as file:
+        for i in range(1, shards):
+            # move each cut to the next line start so no line is split
+            file.seek(max(size * i // shards - 1, boundaries[-1]))
+            file.readline()
+            boundaries.append(max(file.tell(), boundaries[-1]))
+
+    boundaries.append(size)
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end
+    ]
+
+
+def run_shard(
+        urls_file_path: str, part_path: str, start: int, end: int,
+        adaptive: bool, dedupe: bool
+    ) -> str:
+    limiter = None
+    if adaptive:
+        limiter = AdaptiveLimiter(initial_limit=2, max_limit=64, per_host_limit=8)
+    asyncio.run(
+        fetch_urls(
+            urls_file_path, part_path, limiter,
+            checkpoint_path=f"{part_path}.checkpoint", dedupe=dedupe,
+            start=start, end=end,
+        )
+    )
+    return part_path
+
+
+def fetch_urls_sharded(
+        urls_file_path: str, result_file_path: str,
+        processes: int | None = None, adaptive: bool = True, dedupe: bool = False
+    ) -> None:
+    processes = processes or cpu_count()
+    ranges = shard_ranges(urls_file_path, processes)
+    shard_args = [
+        (urls_file_path, f"{result_file_path}.part{i}", start, end, adaptive, dedupe)
+        for i, (start, end) in enumerate(ranges)
+    ]
+
+    with MultiprocessingPool(len(shard_args)) as pool:
+        part_paths = pool.starmap(run_shard, shard_args)
+
+    # parts are appended in shard order, lines within a shard in completion order
+    with open(result_file_path, "ab") as result_file:
+        for part_path in part_paths:
+            with open(part_path, "rb") as part_file:
+                shutil.copyfileobj(part_file, result_file)
+
+    for part_path in part_paths:
+        os.remove(part_path)
+        os.remove(f"{part_path}.checkpoint")
+
+
+if __name__ == "__main__":
+    fetch_urls_sharded(
+        './data/async_http_advanced/urls.txt',
+        './data/async_http_advanced/results.jsonl'
+    )
@@ -1,44 +1,32 @@
+import json
+import math
 import sys
-from concurrent.futures import ThreadPoolExecutor
+from array import array
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from multiprocessing import Pool as MultiprocessingPool
 from multiprocessing import Process, Queue, cpu_count
+from multiprocessing.shared_memory import SharedMemory
 from random import randint
-from time import perf_counter
 
 import matplotlib.pyplot as plt
 
-sys.setrecursionlimit(1100)
-
+from instrumentation import metrics
 
-class Timer:
-    durations = {}
-
-    def __init__(self, name: str) -> None:
-        self.name = name
-    
-    def __enter__(self) -> None:
-        self.start = perf_counter()
+try:
+    from concurrent.futures import InterpreterPoolExecutor
+except ImportError:
+    InterpreterPoolExecutor = None
 
-    def __exit__(self, exc_type, exc_value, traceback) -> None:
-        duration = perf_counter() - self.start
-        Timer.durations[self.name] = duration
-        
+sys.setrecursionlimit(1100)
 
-def write_time(func):
-    def wrapper(*args, **kwargs):
-        kwargs_s = f": {kwargs}" if kwargs else ""
-        func_name = f"{func.__name__}{kwargs_s}"
-        with Timer(func_name):
-            result = func(*args, **kwargs)
-        
-        return result
-    return wrapper
+MAX_NUMBER = 1000
 
 
 def generate_data(n: int) -> list[int]:
     data = []
     for _ in range(n):
-        data.append(randint(1, 1000))
+        data.append(randint(1, MAX_NUMBER))
     
     return data
 
@@ -73,49 +61,122 @@ def is_prime(number: int) -> bool:
     return calc_prime(number, divisor_start)
 
 
+# Precomputed kernels for the generate_data domain
+def build_factorials(limit: int) -> list[int]:
+    factorials = [1] * (limit + 1)
+    for i in range(2, limit + 1):
+        factorials[i] = factorials[i - 1] * i
+
+    return factorials
+
+
+def build_prime_table(limit: int) -> bytearray:
+    table = bytearray([1]) * (limit + 1)
+    for i in range(2, math.isqrt(limit) + 1):
+        if table[i]:
+            table[i * i::i] = bytes(len(range(i * i, limit + 1, i)))
+
+    # same convention as is_prime: everything <= 2 counts as prime
+    table[:3] = b"\x01\x01\x01"
+    return table
+
+
+FACTORIALS = build_factorials(MAX_NUMBER)
+PRIME_TABLE = build_prime_table(MAX_NUMBER)
+
+
+def factorial_table(number: int) -> int:
+    if 1 <= number <= MAX_NUMBER:
+        return FACTORIALS[number]
+
+    return math.factorial(number) if number > 1 else number
+
+
+def is_prime_table(number: int) -> bool:
+    if number <= MAX_NUMBER:
+        return number <= 2 or bool(PRIME_TABLE[number])
+
+    return is_prime(number)
+
+
+def procces_number_table(number: int) -> None:
+    factorial_table(number)
+
+
+KERNELS = {
+    "recursive": procces_number,
+    "table": procces_number_table,
+}
+
+# name -> (strategy, tunable parameters besides numbers and kernel)
+STRATEGIES: dict[str, tuple[Callable, tuple[str, ...]]] = {}
+
+
+def strategy(name: str, params: tuple[str, ...] = ()):
+    def register(func):
+        STRATEGIES[name] = (func, params)
+        return func
+    return register
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled() if is_gil_enabled else True
+
+
 # 0) Main thread only
-@write_time
-def main_thread(numbers: list[int]) -> None:
+@strategy("main_thread")
+def main_thread(numbers: list[int], kernel: str = "recursive") -> None:
+    process = KERNELS[kernel]
     for num in numbers:
-        procces_number(num)
+        process(num)
 
 
-# 1) Thread pool
-@write_time
-def thread_pool(numbers: list[int]) -> None:
+# 1) Thread pool, runs in parallel only on a free-threaded build
+@strategy("thread_pool", ("workers",))
+def thread_pool(
+        numbers: list[int], kernel: str = "recursive", workers: int | None = None
+    ) -> None:
     # cpu_count here only for comparison with mp
-    with ThreadPoolExecutor(max_workers=cpu_count()) as executor:
-        executor.map(procces_number, numbers)
+    with ThreadPoolExecutor(max_workers=workers or cpu_count()) as executor:
+        executor.map(KERNELS[kernel], numbers)
 
 
 # 2) Multiprocessing pool
-@write_time
-def multi_pool(numbers: list[int]) -> None:
-    with MultiprocessingPool(cpu_count()) as pool:
-        pool.map(procces_number, numbers)
+@strategy("multi_pool", ("workers", "chunk_size"))
+def multi_pool(
+        numbers: list[int], chunk_size: int | None = None, kernel: str = "recursive",
+        workers: int | None = None
+    ) -> None:
+    with MultiprocessingPool(workers or cpu_count()) as pool:
+        pool.map(KERNELS[kernel], numbers, chunksize=chunk_size)
 
 
 # 3) Multiprocessing Process and Queue
-@write_time
-def multi_process_queue(numbers: list[int], chunk_size: int = 1) -> None:
+@strategy("multi_process_queue", ("workers", "chunk_size"))
+def multi_process_queue(
+        numbers: list[int], chunk_size: int = 1, kernel: str = "recursive",
+        workers: int | None = None
+    ) -> None:
     queue = Queue()
-    consumer_count = cpu_count() - 1
+    consumer_count = max((workers or cpu_count()) - 1, 1)
     producer_proc = Process(
         target=producer,
         args=(queue, consumer_count, chunk_size, numbers)
     )
 
-    consumer_procs = []
-    for _ in range(consumer_count):
-        consumer_procs.append(
-            Process(target=consumer, args=(queue, ))
-        )
-    
-    for proc in (producer_proc, *consumer_procs):
-        proc.start()
-    
-    for proc in (producer_proc, *consumer_procs):
-        proc.join()
+    with metrics.children() as metrics_queue:
+        consumer_procs = []
+        for _ in range(consumer_count):
+            consumer_procs.append(
+                Process(target=consumer, args=(queue, kernel, metrics_queue))
+            )
+        
+        for proc in (producer_proc, *consumer_procs):
+            proc.start()
+        
+        for proc in (producer_proc, *consumer_procs):
+            proc.join()
 
 
 def producer(
@@ -129,17 +190,142 @@ def producer(
         queue.put(None)
 
 
-def consumer(queue: Queue) -> None:
+def consumer(queue: Queue, kernel: str = "recursive", metrics_queue=None) -> None:
+    metrics.attach(metrics_queue)
+    process = KERNELS[kernel]
     while True:
         chunk = queue.get()
         if chunk is None:
             break
         
-        for num in chunk:
-            procces_number(num)
+        with metrics.timer("consumer_chunk"):
+            for num in chunk:
+                process(num)
+
+    metrics.flush()
 
 
-def visualize(durations: dict):
+# 4) concurrent.futures process pool
+@strategy("process_pool_executor", ("workers", "chunk_size"))
+def process_pool_executor(
+        numbers: list[int], chunk_size: int | None = None, kernel: str = "recursive",
+        workers: int | None = None
+    ) -> None:
+    with ProcessPoolExecutor(max_workers=workers or cpu_count()) as executor:
+        executor.map(KERNELS[kernel], numbers, chunksize=chunk_size or 1)
+
+
+# 5) Subinterpreter pool, Python 3.14+
+if InterpreterPoolExecutor is not None:
+    @strategy("interpreter_pool", ("workers", "chunk_size"))
+    def interpreter_pool(
+            numbers: list[int], chunk_size: int | None = None, kernel: str = "recursive",
+            workers: int | None = None
+        ) -> None:
+        with InterpreterPoolExecutor(max_workers=workers or cpu_count()) as executor:
+            executor.map(KERNELS[kernel], numbers, chunksize=chunk_size or 1)
+
+
+# 6) Shared memory, workers only receive (offset, length) descriptors
+class SharedNumbers:
+    def __init__(self, numbers: list[int]) -> None:
+        data = array("i", numbers)
+        self.length = len(data)
+        self.block = SharedMemory(create=True, size=max(self.length * data.itemsize, 1))
+        self.block.buf[:self.length * data.itemsize] = data.tobytes()
+
+    def ranges(self, chunk_size: int) -> list[tuple[int, int]]:
+        return [
+            (offset, min(chunk_size, self.length - offset))
+            for offset in range(0, self.length, chunk_size)
+        ]
+
+    def __enter__(self) -> "SharedNumbers":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.block.close()
+        self.block.unlink()
+
+
+shared_block: SharedMemory | None = None
+shared_view: memoryview | None = None
+shared_kernel = procces_number
+
+
+def attach_shared_numbers(
+        name: str, kernel: str = "recursive", metrics_queue=None
+    ) -> None:
+    global shared_block, shared_view, shared_kernel
+    metrics.attach(metrics_queue)
+    shared_block = SharedMemory(name=name)
+    shared_view = shared_block.buf.cast("i")
+    shared_kernel = KERNELS[kernel]
+
+
+def process_range(descriptor: tuple[int, int]) -> None:
+    offset, length = descriptor
+    with metrics.timer("process_range"):
+        for num in shared_view[offset:offset + length]:
+            shared_kernel(num)
+
+    # pool workers are terminated rather than exited, so report after every range
+    metrics.flush()
+
+
+@strategy("shared_memory_pool", ("workers", "chunk_size"))
+def shared_memory_pool(
+        numbers: list[int], chunk_size: int = 10000, kernel: str = "recursive",
+        workers: int | None = None
+    ) -> None:
+    with SharedNumbers(numbers) as shared, metrics.children() as metrics_queue:
+        with MultiprocessingPool(
+            workers or cpu_count(), initializer=attach_shared_numbers,
+            initargs=(shared.block.name, kernel, metrics_queue)
+        ) as pool:
+            pool.map(process_range, shared.ranges(chunk_size))
+
+
+@strategy("shared_memory_queue", ("workers", "chunk_size"))
+def shared_memory_queue(
+        numbers: list[int], chunk_size: int = 10000, kernel: str = "recursive",
+        workers: int | None = None
+    ) -> None:
+    queue = Queue()
+    consumer_count = max((workers or cpu_count()) - 1, 1)
+
+    with SharedNumbers(numbers) as shared, metrics.children() as metrics_queue:
+        for descriptor in shared.ranges(chunk_size):
+            queue.put(descriptor)
+        for _ in range(consumer_count):
+            queue.put(None)
+
+        consumer_procs = [
+            Process(
+                target=shared_consumer,
+                args=(queue, shared.block.name, kernel, metrics_queue)
+            )
+            for _ in range(consumer_count)
+        ]
+        for proc in consumer_procs:
+            proc.start()
+        for proc in consumer_procs:
+            proc.join()
+
+
+def shared_consumer(
+        queue: Queue, name: str, kernel: str = "recursive", metrics_queue=None
+    ) -> None:
+    attach_shared_numbers(name, kernel, metrics_queue)
+    while True:
+        descriptor = queue.get()
+        if descriptor is None:
+            break
+
+        process_range(descriptor)
+
+
+def visualize(durations: dict, path: str = "./data/threads_processes/durations.png"):
     names = list(durations.keys())
     values = list(durations.values())
 
@@ -156,26 +342,41 @@ def visualize(durations: dict):
     plt.title("Durations:")
 
     plt.tight_layout()
-    plt.savefig("./data/threads_processes/durations.png", dpi=150)
+    plt.savefig(path, dpi=150)
     plt.show()
 
 
 if __name__ == "__main__":
     numbers = generate_data(1000000)
+    metrics.enabled = True
+
+    runs = [
+        ("main_thread", main_thread, {}),
+        ("thread_pool", thread_pool, {}),
+        ("multi_pool", multi_pool, {}),
+        ("multi_process_queue", multi_process_queue, {}),
+        ("multi_process_queue", multi_process_queue, {"chunk_size": 1000}),
+        ("multi_process_queue", multi_process_queue, {"chunk_size": 10000}),
+        ("multi_process_queue", multi_process_queue, {"chunk_size": 100000}),
+        ("multi_pool", multi_pool, {"chunk_size": 10000}),
+        ("shared_memory_pool", shared_memory_pool, {"chunk_size": 10000}),
+        ("shared_memory_queue", shared_memory_queue, {"chunk_size": 10000}),
+    ]
+    runs += [
+        (name, func, {"kernel": "table"})
+        for name, func in (
+            ("main_thread", main_thread), ("thread_pool", thread_pool),
+            ("multi_pool", multi_pool), ("shared_memory_pool", shared_memory_pool),
+        )
+    ]
 
-    main_thread(numbers)
-    print("main_thread done")
-    thread_pool(numbers)
-    print("thread_pool done")
-    multi_pool(numbers)
-    print("multi_pool done")
-    multi_process_queue(numbers)
-    print("multi_process_queue done")
-    multi_process_queue(numbers, chunk_size=1000)
-    print("multi_process_queue chunk_size=1000 done")
-    multi_process_queue(numbers, chunk_size=10000)
-    print("multi_process_queue chunk_size=10000 done")
-    multi_process_queue(numbers, chunk_size=100000)
-    print("multi_process_queue chunk_size=100000 done")
-
-    visualize(Timer.durations)
+    durations = {}
+    for name, func, kwargs in runs:
+        label = " ".join([name, *(f"{key}={value}" for key, value in kwargs.items())])
+        with metrics.timer(label):
+            func(numbers, **kwargs)
+        durations[label] = metrics.report()[label]["total_ms"] / 1000
+        print(f"{label} done")
+
+    print(json.dumps(metrics.report(), indent=2))
+    visualize(durations)
@@ -0,0 +1,160 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from multiprocessing import cpu_count
+
+from instrumentation import metrics
+from threads_processes import KERNELS, STRATEGIES, generate_data, gil_enabled, visualize
+
+OUTPUT_DIR = "./data/threads_processes"
+# two-sided 95% Student's t critical values by degrees of freedom
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042, 60: 2.000,
+}
+
+
+def t_critical(df: int) -> float:
+    if df > max(T_95):
+        return 1.96
+
+    # round df down to the nearest tabulated value, which widens the interval
+    return T_95[max(bound for bound in T_95 if bound <= df)]
+
+
+def summarize(samples: list[float]) -> dict:
+    mean = statistics.fmean(samples)
+    stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    ci95 = t_critical(len(samples) - 1) * stdev / math.sqrt(len(samples)) if stdev else 0.0
+    return {
+        "mean_s": mean,
+        "stdev_s": stdev,
+        "ci95_s": ci95,
+        "min_s": min(samples),
+        "max_s": max(samples),
+    }
+
+
+def cases(args: argparse.Namespace):
+    for name in args.strategies:
+        func, params = STRATEGIES[name]
+        # only sweep over what the strategy actually takes
+        workers = args.workers if "workers" in params else [None]
+        chunk_sizes = args.chunk_sizes if "chunk_size" in params else [None]
+        for size, worker_count, chunk_size in itertools.product(
+            args.sizes, workers, chunk_sizes
+        ):
+            kwargs = {}
+            if worker_count is not None:
+                kwargs["workers"] = worker_count
+            if chunk_size is not None:
+                kwargs["chunk_size"] = chunk_size
+            yield name, func, size, kwargs
+
+
+def run_case(
+        func, numbers: list[int], kernel: str, kwargs: dict, warmup: int, repeat: int
+    ) -> list[float]:
+    for _ in range(warmup):
+        func(numbers, kernel=kernel, **kwargs)
+    metrics.reset()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(numbers, kernel=kernel, **kwargs)
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+def write_outputs(results: list[dict], output_dir: str) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(os.path.join(output_dir, "durations.json"), "w", encoding="utf-8") as file:
+        json.dump({
+            "python": sys.version,
+            "gil_enabled": gil_enabled(),
+            "cpu_count": cpu_count(),
+            "results": results,
+        }, file, indent=2)
+
+    fields = [key for key in results[0] if key not in ("samples_s", "instrumentation")]
+    with open(os.path.join(output_dir, "durations.csv"), "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def label(result: dict) -> str:
+    parts = [result["strategy"], f"n={result['size']}"]
+    if result["workers"] is not None:
+        parts.append(f"workers={result['workers']}")
+    if result["chunk_size"] is not None:
+        parts.append(f"chunk={result['chunk_size']}")
+
+    return " ".join(parts)
+
+
+def benchmark(args: argparse.Namespace) -> list[dict]:
+    data = {}
+    results = []
+
+    for name, func, size, kwargs in cases(args):
+        # every strategy sees the same numbers for a given size
+        if size not in data:
+            data[size] = generate_data(size)
+
+        samples = run_case(func, data[size], args.kernel, kwargs, args.warmup, args.repeat)
+        result = {
+            "strategy": name,
+            "kernel": args.kernel,
+            "size": size,
+            "workers": kwargs.get("workers"),
+            "chunk_size": kwargs.get("chunk_size"),
+            "repeat": args.repeat,
+            **summarize(samples),
+            "samples_s": samples,
+            "instrumentation": metrics.report(),
+        }
+        metrics.reset()
+        results.append(result)
+        print(
+            f"{label(result)}: {result['mean_s']:.4f}s"
+            f" ± {result['ci95_s']:.4f}s (95% CI, {args.repeat} runs)"
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--strategies", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES)
+    )
+    parser.add_argument("--kernel", choices=list(KERNELS), default="recursive")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[cpu_count()])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument(
+        "--instrument", action="store_true",
+        help="collect per-chunk timings from worker processes"
+    )
+    args = parser.parse_args()
+    metrics.enabled = args.instrument
+
+    results = benchmark(args)
+    write_outputs(results, args.output_dir)
+    visualize(
+        {label(result): result["mean_s"] for result in results},
+        os.path.join(args.output_dir, "durations.png"),
+    )
@@ -1,4 +1,18 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
 import requests
+from requests.adapters import HTTPAdapter
+
+UPSTREAM_URL = os.environ.get(
+    "EXCHANGE_RATE_API_URL", "https://api.exchangerate-api.com/v4/latest"
+)
+RATE_TTL = 300
+RATE_STALE_TTL = 3600
+RATE_NEGATIVE_TTL = 30
+UPSTREAM_TIMEOUT = (3.05, 10)
 
 HTTP_STATUS_LINES = {
     200: "200 OK",
@@ -28,33 +42,160 @@ HTTP_STATUS_LINES = {
 }
 
 
+Response = tuple[str, tuple[tuple[str, str], ...], tuple[bytes]]
+
+
+def make_response(status_code: int, body: bytes) -> Response:
+    headers = (("Content-Type", "text/plain"), ("Content-Length", str(len(body))))
+    # unknown upstream codes (e.g. 429) become 502, same as the ASGI app
+    status_line = HTTP_STATUS_LINES.get(status_code, HTTP_STATUS_LINES[502])
+    return status_line, headers, (body, )
+
+
+METHOD_NOT_ALLOWED = make_response(405, b"GET requests only.")
+CURRENCY_REQUIRED = make_response(404, b"Currency required.")
+
+
 def app(environ, start_response):
-    default_headers = [("Content-Type", "text/plain")]
+    if environ.get("REQUEST_METHOD") != "GET":
+        status_line, headers, body = METHOD_NOT_ALLOWED
+    else:
+        path: str = environ["PATH_INFO"]
+        end = path.find("/", 1)
+        currency = path[1:end] if end != -1 else path[1:]
+
+        if not currency:
+            status_line, headers, body = CURRENCY_REQUIRED
+        else:
+            status_line, headers, body = rate_cache.get(currency)
+
+    # servers may append to the header list, so hand out a copy
+    start_response(status_line, list(headers))
+    return body
+
+
+def make_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+session = make_session()
+
+
+class RateCache:
+    def __init__(self, ttl: float, stale_ttl: float, negative_ttl: float) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        # currency -> (fetched_at, response)
+        self.entries: dict[str, tuple[float, Response]] = {}
+        # non-200 responses, kept apart so they never replace a good entry
+        self.errors: dict[str, tuple[float, Response]] = {}
+        self.refreshing: set[str] = set()
+        self.in_flight: dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
 
-    method = environ.get("REQUEST_METHOD")
-    
-    if method != "GET":
-        start_response(HTTP_STATUS_LINES[405], default_headers)
-        return [b"GET requests only."]
-    
-    path: str = environ["PATH_INFO"]
-    currency: str = path.split("/")[1]
-    
-    if not currency:
-        start_response(HTTP_STATUS_LINES[404], default_headers)
-        return [b"Currency required."]
+    def get(self, currency: str) -> Response:
+        entry = self.entries.get(currency)
+        if entry is not None:
+            fetched_at, response = entry
+            age = time.monotonic() - fetched_at
 
-    status_code, r_text = fetch_exchange_rate(currency)
-    status_line = HTTP_STATUS_LINES[status_code]
+            if age < self.ttl:
+                return response
+            if age < self.stale_ttl:
+                if self.recent_error(currency) is None:
+                    self.refresh_in_background(currency)
+                return response
 
-    start_response(status_line, default_headers)
-    return [r_text]
+        error = self.recent_error(currency)
+        if error is not None:
+            return error
+
+        return self.refresh(currency)
+
+    def recent_error(self, currency: str) -> Response | None:
+        entry = self.errors.get(currency)
+        if entry is None or time.monotonic() - entry[0] >= self.negative_ttl:
+            return None
+
+        return entry[1]
+
+    def refresh(self, currency: str) -> Response:
+        with self.lock:
+            future = self.in_flight.get(currency)
+            is_leader = future is None
+            if is_leader:
+                future = self.in_flight[currency] = Future()
+                self.upstream_calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            status_code, content = fetch_exchange_rate(currency)
+            response = make_response(status_code, content)
+            if status_code == 200:
+                self.entries[currency] = (time.monotonic(), response)
+                self.errors.pop(currency, None)
+            else:
+                # unknown currencies, 429s and 5xx back off upstream for negative_ttl
+                self.errors[currency] = (time.monotonic(), response)
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[currency]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            del self.in_flight[currency]
+        future.set_result(response)
+
+        return response
+
+    def refresh_in_background(self, currency: str) -> None:
+        with self.lock:
+            if currency in self.refreshing:
+                return
+            self.refreshing.add(currency)
+
+        threading.Thread(
+            target=self._refresh_and_release, args=(currency, ), daemon=True
+        ).start()
+
+    def _refresh_and_release(self, currency: str) -> None:
+        try:
+            self.refresh(currency)
+        except requests.RequestException:
+            pass
+        finally:
+            with self.lock:
+                self.refreshing.discard(currency)
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "upstream_calls": self.upstream_calls,
+                "coalesced_calls": self.coalesced_calls,
+                "in_flight": len(self.in_flight),
+                "cached": len(self.entries),
+                "cached_errors": len(self.errors),
+            }
+
+
+rate_cache = RateCache(RATE_TTL, RATE_STALE_TTL, RATE_NEGATIVE_TTL)
 
 
 def fetch_exchange_rate(currency: str) -> tuple[int, bytes]:
-    url = f"https://api.exchangerate-api.com/v4/latest/{currency}"
-    
-    with requests.Session() as session:
-        r = session.get(url)
-    
+    url = f"{UPSTREAM_URL}/{currency}"
+
+    r = session.get(url, timeout=UPSTREAM_TIMEOUT)
+
     return r.status_code, r.content
\ No newline at end of file
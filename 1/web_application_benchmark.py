@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from itertools import count
+
+import aiohttp
+from aiohttp import web
+
+STUB_PORT = 8090
+SERVERS = {
+    "gunicorn_gthread": (
+        8091,
+        [
+            "gunicorn", "-w", "1", "-k", "gthread", "--threads", "32",
+            "-b", "127.0.0.1:8091", "web_application:app",
+        ],
+    ),
+    "waitress": (
+        8092,
+        [
+            "waitress-serve", "--threads=32", "--listen=127.0.0.1:8092",
+            "web_application:app",
+        ],
+    ),
+    "uvicorn_asgi": (
+        8093,
+        [
+            "uvicorn", "--workers", "1", "--port", "8093",
+            "--log-level", "warning", "asgi_application:app",
+        ],
+    ),
+}
+
+
+def run_stub(latency: float) -> None:
+    async def rates(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        currency = request.match_info["currency"]
+        return web.json_response({"base": currency, "rates": {currency: 1.0}})
+
+    stub = web.Application()
+    stub.router.add_get("/{currency}", rates)
+    web.run_app(stub, host="127.0.0.1", port=STUB_PORT, print=None)
+
+
+async def wait_until_up(port: int, host: str = "127.0.0.1", timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+
+    raise TimeoutError(f"nothing listening on port {port}")
+
+
+async def load(port: int, requests: int, concurrency: int, run_id: int) -> dict:
+    # servers stay up across runs and cache rates, so currencies are unique per run too
+    currencies = count()
+    latencies: list[float] = []
+    errors = 0
+
+    async def client(session: aiohttp.ClientSession) -> None:
+        nonlocal errors
+        while (i := next(currencies)) < requests:
+            start = time.perf_counter()
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/C{run_id}-{i}") as r:
+                    await r.read()
+                    if r.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / duration, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+async def benchmark(requests: int, concurrency_levels: list[int], latency: float) -> None:
+    env = {**os.environ, "EXCHANGE_RATE_API_URL": f"http://127.0.0.1:{STUB_PORT}"}
+    stub = subprocess.Popen(
+        [sys.executable, __file__, "--stub", "--latency", str(latency)]
+    )
+
+    try:
+        await wait_until_up(STUB_PORT)
+
+        for name, (port, cmd) in SERVERS.items():
+            server = subprocess.Popen(cmd, env=env, stderr=subprocess.DEVNULL)
+            try:
+                await wait_until_up(port)
+                for run_id, concurrency in enumerate(concurrency_levels):
+                    result = await load(port, requests, concurrency, run_id)
+                    print(json.dumps({"server": name, **result}))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stub", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    if args.stub:
+        run_stub(args.latency)
+    else:
+        asyncio.run(benchmark(args.requests, args.concurrency, args.latency))
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from redis import Redis
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis
+
+from distributed_lock.locks import AsyncFuncLock, FuncLock
+from rate_limiter import AsyncRateLimiter, RateLimiter
+from redis_queue import AsyncRedisQueue, RedisQueue
+
+WORKLOADS = ("limiter", "queue", "lock")
+LAG_INTERVAL = 0.01
+
+
+def make_ops(workload: str, sync: bool, client: Redis | AsyncRedis, worker_id: int):
+    # returns a callable doing one operation, a coroutine function unless sync
+    if workload == "limiter":
+        limiter_cls = RateLimiter if sync else AsyncRateLimiter
+        limiter = limiter_cls(
+            limit=1_000_000, window=60, key="bench_limiter",
+            algorithm="gcra", redis_cli=client
+        )
+        return lambda: limiter.test(str(worker_id))
+
+    if workload == "queue":
+        queue_cls = RedisQueue if sync else AsyncRedisQueue
+        queue = queue_cls(client, name=f"bench_queue:{worker_id}", exp_time=timedelta(minutes=1))
+        if sync:
+            def op():
+                queue.publish({"worker": worker_id})
+                queue.consume()
+            return op
+
+        async def async_op():
+            await queue.publish({"worker": worker_id})
+            await queue.consume()
+        return async_op
+
+    lock_key = f"bench_lock:{worker_id}"
+    if sync:
+        def lock_op():
+            with FuncLock(client, lock_key, timedelta(seconds=5)):
+                pass
+        return lock_op
+
+    async def async_lock_op():
+        async with AsyncFuncLock(client, lock_key, timedelta(seconds=5)):
+            pass
+    return async_lock_op
+
+
+async def measure_lag(lags: list[float], stop: asyncio.Event) -> None:
+    # how late the loop wakes a sleeping task, blocking calls show up here
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(time.perf_counter() - start - LAG_INTERVAL)
+
+
+async def run_worker(op, sync: bool, deadline: float) -> int:
+    ops = 0
+    while time.perf_counter() < deadline:
+        if sync:
+            op()
+            # give other tasks a chance, the call itself already blocked the loop
+            await asyncio.sleep(0)
+        else:
+            await op()
+        ops += 1
+
+    return ops
+
+
+async def run(
+        workload: str, sync: bool, concurrency: int, duration: float,
+        host: str, port: int, pool_size: int
+    ) -> dict:
+    if sync:
+        client = Redis(host=host, port=port, decode_responses=True)
+    else:
+        # one pool shared by every limiter, queue and lock
+        client = AsyncRedis(connection_pool=BlockingConnectionPool(
+            host=host, port=port, max_connections=pool_size, decode_responses=True
+        ))
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(lags, stop))
+
+    deadline = time.perf_counter() + duration
+    ops = await asyncio.gather(*(
+        run_worker(make_ops(workload, sync, client, worker_id), sync, deadline)
+        for worker_id in range(concurrency)
+    ))
+
+    stop.set()
+    await lag_task
+    if sync:
+        client.close()
+    else:
+        await client.aclose()
+
+    lags.sort()
+    return {
+        "workload": workload,
+        "client": "sync" if sync else "async",
+        "concurrency": concurrency,
+        "ops": round(sum(ops) / duration),
+        "loop_lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2) if lags else None,
+        "loop_lag_p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 2) if lags else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--pool-size", type=int, default=50)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    for workload in args.workloads:
+        for sync in (True, False):
+            for concurrency in args.concurrency:
+                result = asyncio.run(run(
+                    workload, sync, concurrency, args.duration,
+                    args.host, args.port, args.pool_size
+                ))
+                print(json.dumps(result))
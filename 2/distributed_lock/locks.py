@@ -4,16 +4,21 @@ Pickling issue needs fixing
 
 
 import asyncio
+import sys
 import time
 from collections.abc import Callable
 from datetime import timedelta
 from functools import wraps
 from multiprocessing import Process, Queue
+from pathlib import Path
 from typing import cast
 
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 
-redis_cli = Redis(host='localhost', port=6379, decode_responses=True)
+# the clients are shared with the rest of 2/, also when run from this directory
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from redis_clients import async_redis_cli, redis_cli
 
 
 class FuncLock:
@@ -52,9 +57,11 @@ class FuncLock:
         self.lock_acquired = False
 
     def _get_timestr(self, exp_mins: int | None = None) -> str:
+        return self._format_timestr(self._get_time(), exp_mins)
+
+    def _format_timestr(self, cur_time: tuple[int, int], exp_mins: int | None = None) -> str:
         exp_mins = exp_mins if exp_mins is not None else self.lock_release_exp
 
-        cur_time = self._get_time()
         exp_seconds = cur_time[0] + exp_mins * 60
         return f"{exp_seconds},{cur_time[1]}"
     
@@ -62,12 +69,16 @@ class FuncLock:
         return cast(tuple[int, int], self.redis_cli.time())
 
     def _is_expired(self, timespec: str | tuple[int, int]) -> bool:
+        return self._expired_at(timespec, self._get_time())
+
+    @staticmethod
+    def _expired_at(timespec: str | tuple[int, int], cur_time: tuple[int, int]) -> bool:
         if isinstance(timespec, str):
             seconds, microseconds = map(int, timespec.split(","))
         else:
             seconds, microseconds = timespec
 
-        cur_seconds, cur_microseconds = self._get_time()
+        cur_seconds, cur_microseconds = cur_time
 
         if seconds < cur_seconds:
             return True
@@ -78,6 +89,51 @@ class FuncLock:
         return False
 
 
+class AsyncFuncLock(FuncLock):
+    def __init__(
+            self, redis_cli: AsyncRedis, func_key: str, func_max_time: timedelta
+        ) -> None:
+        super().__init__(redis_cli, func_key, func_max_time)
+
+    def __enter__(self):
+        # the inherited one would treat the client's coroutines as truthy results
+        raise TypeError("AsyncFuncLock must be used with 'async with'")
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        raise TypeError("AsyncFuncLock must be used with 'async with'")
+
+    async def __aenter__(self):
+        while True:
+            cur_timestr = self._format_timestr(await self._get_time_async())
+
+            if await self.redis_cli.set(self.func_key, cur_timestr, nx=True):
+                break
+
+            existing_timestr = await self.redis_cli.get(self.func_key)
+            if existing_timestr is not None and self._expired_at(
+                existing_timestr, await self._get_time_async()
+            ):
+                old_timestr = await self.redis_cli.set(self.func_key, cur_timestr, get=True)
+
+                # None means the holder released it in between, the lock is ours either way
+                if old_timestr is None or self._expired_at(
+                    old_timestr, await self._get_time_async()
+                ):
+                    break
+            
+            await asyncio.sleep(0.1)
+
+        self.lock_acquired = True
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.redis_cli.delete(self.func_key)
+        self.lock_acquired = False
+
+    async def _get_time_async(self) -> tuple[int, int]:
+        return cast(tuple[int, int], await self.redis_cli.time())
+
+
 def worker(q: Queue, func: Callable, args: tuple, kwargs: dict):
     try:
         result = func(*args, **kwargs)
@@ -88,7 +144,8 @@ def worker(q: Queue, func: Callable, args: tuple, kwargs: dict):
 
 def single(
         func: Callable | None = None, *,
-        max_processing_time: timedelta = timedelta(seconds=30)
+        max_processing_time: timedelta = timedelta(seconds=30),
+        redis_cli: Redis = redis_cli, async_redis_cli: AsyncRedis = async_redis_cli
     ):
     def lock(func):
         prefix = "lock_"
@@ -116,7 +173,7 @@ def single(
         
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            with FuncLock(redis_cli, func_key, max_processing_time):
+            async with AsyncFuncLock(async_redis_cli, func_key, max_processing_time):
                 result = await asyncio.wait_for(
                     func(*args, **kwargs),
                     timeout=max_processing_time.total_seconds()
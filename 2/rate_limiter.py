@@ -1,45 +1,346 @@
+import itertools
 import random
+import threading
 import time
-from typing import cast
+from uuid import uuid4
 
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 
-redis_cli = Redis(host='localhost', port=6379, decode_responses=True)
+from redis_clients import async_redis_cli, redis_cli
+
+# Every script takes KEYS[1] - limiter key, ARGV[1] - window in microseconds,
+# ARGV[2] - limit, ARGV[3] - unique request id, ARGV[4] - permits wanted,
+# ARGV[5] - microseconds since the permits being handed back were reserved,
+# and returns how many were granted. Negative permits hand unused ones back.
+# Time comes from the server so clients with skewed clocks agree.
+NOW_US_LUA = """
+local now = redis.call('TIME')
+local now_us = tonumber(now[1]) * 1000000 + tonumber(now[2])
+local window_us = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local permits = tonumber(ARGV[4])
+"""
+
+# sorted set with a member per allowed request, O(limit) memory
+SLIDING_LOG_LUA = NOW_US_LUA + """
+if permits < 0 then
+    for i = 1, -permits do
+        redis.call('ZREM', KEYS[1], ARGV[3] .. ':' .. i)
+    end
+    return 0
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now_us - window_us)
+local granted = math.min(permits, limit - redis.call('ZCARD', KEYS[1]))
+if granted <= 0 then
+    return 0
+end
+
+for i = 1, granted do
+    redis.call('ZADD', KEYS[1], now_us, ARGV[3] .. ':' .. i)
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil(window_us / 1000))
+return granted
+"""
+
+# two fixed windows, the previous one weighted by how much of it still overlaps
+SLIDING_WINDOW_LUA = NOW_US_LUA + """
+local window = math.floor(now_us / window_us)
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+
+local last_window = tonumber(state[1])
+if last_window ~= window then
+    if last_window == window - 1 then
+        previous = current
+    else
+        previous = 0
+    end
+    current = 0
+end
+
+local granted = 0
+if permits < 0 then
+    -- hand back to whichever window the permits were counted in
+    local reserved_window = math.floor((now_us - tonumber(ARGV[5])) / window_us)
+    if reserved_window == window then
+        current = math.max(current + permits, 0)
+    elseif reserved_window == window - 1 then
+        previous = math.max(previous + permits, 0)
+    end
+else
+    local elapsed = (now_us - window * window_us) / window_us
+    granted = math.min(permits, math.ceil(limit - previous * (1 - elapsed) - current))
+    if granted <= 0 then
+        return 0
+    end
+    current = current + granted
+end
+
+redis.call('HSET', KEYS[1], 'window', window, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], math.ceil(2 * window_us / 1000))
+return granted
+"""
+
+# generic cell rate algorithm, a single theoretical arrival time per key
+GCRA_LUA = NOW_US_LUA + """
+local interval = window_us / limit
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now_us, now_us)
+
+local granted = 0
+if permits < 0 then
+    tat = math.max(tat + permits * interval, now_us)
+else
+    -- small epsilon so float error doesn't cost the last permit
+    granted = math.min(permits, math.floor((window_us - (tat - now_us)) / interval + 1e-9))
+    if granted <= 0 then
+        return 0
+    end
+    tat = tat + granted * interval
+end
+
+if tat > now_us then
+    redis.call(
+        'SET', KEYS[1], string.format('%.0f', tat),
+        'PX', math.ceil((tat - now_us) / 1000)
+    )
+else
+    redis.call('DEL', KEYS[1])
+end
+return granted
+"""
+
+# bucket of limit tokens refilled continuously at limit per window
+TOKEN_BUCKET_LUA = NOW_US_LUA + """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local ts = tonumber(state[2]) or now_us
+tokens = math.min(limit, tokens + (now_us - ts) * limit / window_us)
+
+local granted = 0
+if permits < 0 then
+    tokens = math.min(limit, tokens - permits)
+else
+    granted = math.min(permits, math.floor(tokens))
+    tokens = tokens - granted
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', string.format('%.0f', now_us))
+redis.call('PEXPIRE', KEYS[1], math.ceil(window_us / 1000))
+return granted
+"""
+
+ALGORITHMS = {
+    "sliding_log": SLIDING_LOG_LUA,
+    "sliding_window": SLIDING_WINDOW_LUA,
+    "gcra": GCRA_LUA,
+    "token_bucket": TOKEN_BUCKET_LUA,
+}
 
 
 class RateLimitExceed(Exception):
     pass
 
 
+class Lease:
+    def __init__(self, request_id: str, permits: int, reserved_at: float, ttl: float) -> None:
+        self.request_id = request_id
+        self.permits = permits
+        self.reserved_at = reserved_at
+        self.expires_at = reserved_at + ttl
+
+
 class RateLimiter:
-    def test(self) -> bool:
-        def get_time_float() -> float:
-            secs, microsecs = get_time()
-            return secs + microsecs / 1_000_000
-        
-        def get_time() -> tuple[int, int]:
-            return  cast(tuple[int, int], redis_cli.time())
+    def __init__(
+            self, limit: int = 5, window: float = 3, key: str | None = None,
+            algorithm: str = "sliding_log", redis_cli: Redis = redis_cli,
+            lease_size: int = 1, lease_ttl: float | None = None
+        ) -> None:
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown algorithm {algorithm!r}, expected one of {list(ALGORITHMS)}")
 
-        name_key = f"rate_limiter_{id(self)}"
-        exp_secs = 3
-        rate_limit = 5
+        self.limit = limit
+        self.window_us = int(window * 1_000_000)
+        self.key = key or f"rate_limiter:{uuid4().hex}"
+        self.redis_cli = redis_cli
+        # EVALSHA, falls back to EVAL once per server when the script isn't cached yet
+        self.script = redis_cli.register_script(ALGORITHMS[algorithm])
 
-        cur_time = get_time_float()
+        # with lease_size > 1 permits are reserved in batches and handed out locally.
+        # Redis counts them when reserved, but they may be used up to lease_ttl later,
+        # after the window has partly moved past the reservation. So a key can see up
+        # to limit + lease_size - 1 requests per leasing client in one window; unused
+        # permits only under-admit until they are handed back.
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl if lease_ttl is not None else window / 10
+        self.leases: dict[str, Lease] = {}
+        self.expired: list[tuple[str, Lease]] = []
+        self.lock = threading.Lock()
 
-        redis_cli.zremrangebyscore(name_key, 0, cur_time - exp_secs)
+        # request ids must stay unique across clients sharing a key
+        self.client_id = uuid4().hex
+        self.counter = itertools.count()
 
-        request_count = cast(
-            int, redis_cli.zcount(name_key, cur_time - exp_secs, cur_time)
-        )
-        
-        if request_count >= rate_limit:
+    def name_key(self, key: str | None) -> str:
+        # key narrows the limiter down, e.g. to a single API key
+        return self.key if key is None else f"{self.key}:{key}"
+
+    def args(self, request_id: str, permits: int, elapsed_us: int = 0) -> list:
+        return [self.window_us, self.limit, request_id, permits, elapsed_us]
+
+    def test(self, key: str | None = None) -> bool:
+        name_key = self.name_key(key)
+        if self.take_leased(name_key):
+            allowed = True
+        else:
+            request_id = f"{self.client_id}:{next(self.counter)}"
+            granted = self.script(keys=[name_key], args=self.args(request_id, self.lease_size))
+            allowed = self.store_lease(name_key, request_id, int(granted))
+
+        if self.expired:
+            self.give_back(self.pop_expired())
+        return allowed
+
+    def test_many(self, keys: list[str | None]) -> list[bool]:
+        name_keys = [self.name_key(key) for key in keys]
+        results = [self.take_leased(name_key) for name_key in name_keys]
+
+        # everything not served locally goes out in a single round trip
+        pipe = self.redis_cli.pipeline(transaction=False)
+        pending = self.queue_reservations(pipe, name_keys, results)
+        if pending:
+            for (i, name_key, request_id), granted in zip(pending, pipe.execute()):
+                results[i] = self.store_lease(name_key, request_id, int(granted))
+
+        if self.expired:
+            self.give_back(self.pop_expired())
+        return results
+
+    def queue_reservations(
+            self, pipe, name_keys: list[str], results: list[bool]
+        ) -> list[tuple[int, str, str]]:
+        pending = []
+        for i, name_key in enumerate(name_keys):
+            if not results[i]:
+                request_id = f"{self.client_id}:{next(self.counter)}"
+                self.queue_script(pipe, name_key, self.args(request_id, self.lease_size))
+                pending.append((i, name_key, request_id))
+
+        return pending
+
+    def queue_script(self, pipe, name_key: str, args: list) -> None:
+        # the async script object is a coroutine function, so queue EVALSHA directly;
+        # execute() loads scripts the server doesn't have yet
+        pipe.scripts.add(self.script)
+        pipe.evalsha(self.script.sha, 1, name_key, *args)
+
+    # lease bookkeeping is local only, leases to give back are queued in self.expired
+    def take_leased(self, name_key: str) -> bool:
+        if self.lease_size == 1:
             return False
 
-        set_item = {str(cur_time): cur_time}
-        redis_cli.zadd(name_key, set_item)
+        with self.lock:
+            lease = self.leases.get(name_key)
+            if lease is None:
+                return False
+            if time.monotonic() < lease.expires_at and lease.permits:
+                lease.permits -= 1
+                return True
+
+            del self.leases[name_key]
+            if lease.permits:
+                self.expired.append((name_key, lease))
+            return False
+
+    def store_lease(self, name_key: str, request_id: str, granted: int) -> bool:
+        if granted <= 1:
+            return granted == 1
+
+        lease = Lease(request_id, granted - 1, time.monotonic(), self.lease_ttl)
+        with self.lock:
+            previous = self.leases.get(name_key)
+            self.leases[name_key] = lease
+            if previous is not None and previous.permits:
+                self.expired.append((name_key, previous))
 
         return True
-    
+
+    def pop_expired(self, release_all: bool = False) -> list[tuple[str, Lease]]:
+        with self.lock:
+            expired, self.expired = self.expired, []
+            if release_all:
+                expired.extend(self.leases.items())
+                self.leases = {}
+
+        return [(name_key, lease) for name_key, lease in expired if lease.permits]
+
+    def queue_give_backs(self, pipe, leases: list[tuple[str, Lease]]) -> None:
+        for name_key, lease in leases:
+            elapsed_us = int((time.monotonic() - lease.reserved_at) * 1_000_000)
+            self.queue_script(
+                pipe, name_key, self.args(lease.request_id, -lease.permits, elapsed_us)
+            )
+            lease.permits = 0
+
+    def give_back(self, leases: list[tuple[str, Lease]]) -> None:
+        if leases:
+            pipe = self.redis_cli.pipeline(transaction=False)
+            self.queue_give_backs(pipe, leases)
+            pipe.execute()
+
+    def release(self) -> None:
+        # returns every unused leased permit, e.g. on shutdown
+        self.give_back(self.pop_expired(release_all=True))
+
+
+class AsyncRateLimiter(RateLimiter):
+    def __init__(
+            self, limit: int = 5, window: float = 3, key: str | None = None,
+            algorithm: str = "sliding_log", redis_cli: AsyncRedis = async_redis_cli,
+            lease_size: int = 1, lease_ttl: float | None = None
+        ) -> None:
+        super().__init__(limit, window, key, algorithm, redis_cli, lease_size, lease_ttl)
+
+    async def test(self, key: str | None = None) -> bool:
+        name_key = self.name_key(key)
+        if self.take_leased(name_key):
+            allowed = True
+        else:
+            request_id = f"{self.client_id}:{next(self.counter)}"
+            granted = await self.script(
+                keys=[name_key], args=self.args(request_id, self.lease_size)
+            )
+            allowed = self.store_lease(name_key, request_id, int(granted))
+
+        if self.expired:
+            await self.give_back(self.pop_expired())
+        return allowed
+
+    async def test_many(self, keys: list[str | None]) -> list[bool]:
+        name_keys = [self.name_key(key) for key in keys]
+        results = [self.take_leased(name_key) for name_key in name_keys]
+
+        pipe = self.redis_cli.pipeline(transaction=False)
+        pending = self.queue_reservations(pipe, name_keys, results)
+        if pending:
+            for (i, name_key, request_id), granted in zip(pending, await pipe.execute()):
+                results[i] = self.store_lease(name_key, request_id, int(granted))
+
+        if self.expired:
+            await self.give_back(self.pop_expired())
+        return results
+
+    async def give_back(self, leases: list[tuple[str, Lease]]) -> None:
+        if leases:
+            pipe = self.redis_cli.pipeline(transaction=False)
+            self.queue_give_backs(pipe, leases)
+            await pipe.execute()
+
+    async def release(self) -> None:
+        await self.give_back(self.pop_expired(release_all=True))
+
 
 def make_api_request(rate_limiter: RateLimiter):
     if not rate_limiter.test():
@@ -88,3 +389,29 @@ if __name__ == '__main__':
         time.sleep(random.randint(1, 2))
         test_request(rate_limiter)
 
+
+
+    # test 4
+    print("\nStarting test 4")
+
+    for algorithm in ALGORITHMS:
+        rate_limiter = RateLimiter(limit=5, window=3, algorithm=algorithm)
+        allowed = sum(rate_limiter.test() for _ in range(6))
+        assert allowed == 5, (algorithm, allowed)
+        print(f"{algorithm}: {allowed} of 6 allowed")
+
+
+    # test 5
+    print("\nStarting test 5")
+
+    for algorithm in ALGORITHMS:
+        rate_limiter = RateLimiter(
+            limit=100, window=60, algorithm=algorithm, lease_size=10
+        )
+        allowed = sum(rate_limiter.test() for _ in range(120))
+        assert allowed == 100, (algorithm, allowed)
+
+        batch = rate_limiter.test_many(["a", "b", "a", None])
+        assert batch == [True, True, True, False], (algorithm, batch)
+        rate_limiter.release()
+        print(f"{algorithm}: leased {allowed} of 120, batch {batch}")
@@ -0,0 +1,68 @@
+import argparse
+import json
+import time
+
+from redis import Redis
+
+from rate_limiter import ALGORITHMS, RateLimiter
+
+
+def evalsha_calls(redis_cli: Redis) -> int:
+    return redis_cli.info("commandstats").get("cmdstat_evalsha", {}).get("calls", 0)
+
+
+def run(
+        redis_cli: Redis, algorithm: str, limit: int, window: float, requests: int,
+        lease_size: int = 1
+    ) -> dict:
+    limiter = RateLimiter(
+        limit, window, algorithm=algorithm, redis_cli=redis_cli, lease_size=lease_size
+    )
+    redis_cli.delete(limiter.key)
+    calls_before = evalsha_calls(redis_cli)
+
+    allowed = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        allowed += limiter.test()
+    duration = time.perf_counter() - start
+    redis_calls = evalsha_calls(redis_cli) - calls_before
+    limiter.release()
+
+    # memory for one key that is sitting at its limit
+    memory_bytes = redis_cli.memory_usage(limiter.key, samples=0)
+    redis_cli.delete(limiter.key)
+
+    return {
+        "algorithm": algorithm,
+        "limit": limit,
+        "window_s": window,
+        "lease_size": lease_size,
+        "requests": requests,
+        "allowed": allowed,
+        "ops": round(requests / duration),
+        "us_per_op": round(duration / requests * 1e6, 1),
+        "redis_calls": redis_calls,
+        "key_memory_bytes": memory_bytes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--algorithms", nargs="+", choices=list(ALGORITHMS), default=list(ALGORITHMS)
+    )
+    parser.add_argument("--limit", type=int, default=10_000)
+    parser.add_argument("--window", type=float, default=60)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--lease-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    redis_cli = Redis(host=args.host, port=args.port, decode_responses=True)
+    for algorithm in args.algorithms:
+        for lease_size in args.lease_sizes:
+            print(json.dumps(run(
+                redis_cli, algorithm, args.limit, args.window, args.requests, lease_size
+            )))
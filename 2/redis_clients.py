@@ -0,0 +1,9 @@
+from redis import Redis
+from redis.asyncio import ConnectionPool
+from redis.asyncio import Redis as AsyncRedis
+
+redis_cli = Redis(host='localhost', port=6379, decode_responses=True)
+# one pool behind every async rate limiter, queue and lock in the process
+async_redis_cli = AsyncRedis(connection_pool=ConnectionPool(
+    host='localhost', port=6379, decode_responses=True
+))
@@ -4,6 +4,12 @@ from typing import cast
 from uuid import uuid4
 
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from redis_clients import async_redis_cli
+
+# values per RPUSH, keeps single commands from getting huge
+PUSH_BATCH = 1000
 
 
 class RedisQueue:
@@ -18,22 +24,99 @@ class RedisQueue:
             self.exp_time = timedelta(minutes=5)
         else:
             self.exp_time = exp_time
-        
-        if self.exp_time:
-            self.redis_cli.expire(self.name_key, self.exp_time)
 
     def publish(self, msg: dict):
-        msg_str = json.dumps(msg)
-        self.redis_cli.rpush(self.name_key, msg_str)
+        self.publish_many([msg])
+
+    def publish_many(self, msgs: list[dict]):
+        msg_strs = [json.dumps(msg) for msg in msgs]
+        if not msg_strs:
+            return
+
+        # the list only exists after the first push, so refresh the ttl with it
+        with self.redis_cli.pipeline(transaction=False) as pipe:
+            queue_push(pipe, self.name_key, msg_strs, self.exp_time)
+            pipe.execute()
 
-    def consume(self) -> dict | None:
-        msg_str = cast(str, self.redis_cli.lpop(self.name_key))
+    # timeout=None never blocks, 0 blocks until a message arrives
+    def consume(self, timeout: float | None = None) -> dict | None:
+        if timeout is None:
+            msg_str = cast(str, self.redis_cli.lpop(self.name_key))
+        else:
+            popped = self.redis_cli.blpop([self.name_key], timeout=timeout)
+            msg_str = popped[1] if popped else None
 
         if msg_str:
             return json.loads(msg_str)
         
         return None
 
+    def consume_many(self, n: int, timeout: float | None = None) -> list[dict]:
+        if timeout is None:
+            msg_strs = self.redis_cli.lpop(self.name_key, count=n)
+        else:
+            # BLMPOP needs Redis 7
+            popped = self.redis_cli.blmpop(timeout, 1, self.name_key, direction="LEFT", count=n)
+            msg_strs = popped[1] if popped else None
+
+        return [json.loads(msg_str) for msg_str in msg_strs or []]
+
+
+class AsyncRedisQueue:
+    def __init__(
+            self, redis_cli: AsyncRedis = async_redis_cli,
+            name: str | None = None, exp_time: timedelta | None = None
+        ) -> None:
+        self.redis_cli = redis_cli
+        self.name_key = name or f"queue:{uuid4()}"
+
+        if name is None and exp_time is None:
+            self.exp_time = timedelta(minutes=5)
+        else:
+            self.exp_time = exp_time
+
+    async def publish(self, msg: dict):
+        await self.publish_many([msg])
+
+    async def publish_many(self, msgs: list[dict]):
+        msg_strs = [json.dumps(msg) for msg in msgs]
+        if not msg_strs:
+            return
+
+        async with self.redis_cli.pipeline(transaction=False) as pipe:
+            queue_push(pipe, self.name_key, msg_strs, self.exp_time)
+            await pipe.execute()
+
+    async def consume(self, timeout: float | None = None) -> dict | None:
+        if timeout is None:
+            msg_str = cast(str, await self.redis_cli.lpop(self.name_key))
+        else:
+            popped = await self.redis_cli.blpop([self.name_key], timeout=timeout)
+            msg_str = popped[1] if popped else None
+
+        if msg_str:
+            return json.loads(msg_str)
+
+        return None
+
+    async def consume_many(self, n: int, timeout: float | None = None) -> list[dict]:
+        if timeout is None:
+            msg_strs = await self.redis_cli.lpop(self.name_key, count=n)
+        else:
+            popped = await self.redis_cli.blmpop(
+                timeout, 1, self.name_key, direction="LEFT", count=n
+            )
+            msg_strs = popped[1] if popped else None
+
+        return [json.loads(msg_str) for msg_str in msg_strs or []]
+
+
+def queue_push(pipe, name_key: str, msg_strs: list[str], exp_time: timedelta | None) -> None:
+    for i in range(0, len(msg_strs), PUSH_BATCH):
+        pipe.rpush(name_key, *msg_strs[i:i + PUSH_BATCH])
+    if exp_time:
+        pipe.expire(name_key, exp_time)
+
 
 if __name__ == '__main__':
     redis_cli = Redis(host='localhost', port=6379, decode_responses=True)
@@ -46,4 +129,10 @@ if __name__ == '__main__':
     assert q.consume() == {'a': 1}
     assert q.consume() == {'b': 2}
     assert q.consume() == {'c': 3}
+    assert q.consume(timeout=0.1) is None
+
+    q.publish_many([{'n': i} for i in range(2500)])
+    assert q.consume_many(1000) == [{'n': i} for i in range(1000)]
+    assert q.consume_many(2000, timeout=1) == [{'n': i} for i in range(1000, 2500)]
+    assert q.consume_many(10) == []
 